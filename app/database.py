@@ -1,4 +1,5 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import os
 
@@ -6,7 +7,27 @@ load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 
-client = MongoClient(MONGO_URI)
+# The process holds two connection pools to the same cluster: the PyMongo
+# client below (sync routes and workers) and the Motor client further down
+# (websockets and other async handlers). They share one budget of 100
+# connections, 10 of them kept warm, split through the env vars below.
+# Sync routes run in Starlette's 40-thread pool, so the sync side can never
+# use more than 40 sockets at once; the async side gets the rest. Each open
+# websocket holds at most one in-flight query at a time, so 60 async
+# connections comfortably covers a few hundred concurrent clients; requests
+# beyond either cap wait up to 2s for a free socket instead of opening new ones.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "40"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_ASYNC_MAX_POOL_SIZE = int(os.getenv("MONGO_ASYNC_MAX_POOL_SIZE", "60"))
+MONGO_ASYNC_MIN_POOL_SIZE = int(os.getenv("MONGO_ASYNC_MIN_POOL_SIZE", "5"))
+
+client = MongoClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    waitQueueTimeoutMS=2000,
+    serverSelectionTimeoutMS=3000
+)
 
 try:
     client.admin.command("ping")
@@ -15,6 +36,16 @@ try:
 except Exception as e:
     print("❌ MongoDB connection error:", e)
 
+# Async client for the websocket handlers, so their round-trips don't block the
+# event loop. Motor only connects on first use, inside the running loop.
+async_client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_ASYNC_MAX_POOL_SIZE,
+    minPoolSize=MONGO_ASYNC_MIN_POOL_SIZE,
+    waitQueueTimeoutMS=2000,
+    serverSelectionTimeoutMS=3000
+)
+
 db = client["ridealertDB"]
 user_collection = db["users"]
 vehicle_collection = db["vehicles"]
@@ -25,3 +56,23 @@ get_fleets_collection = db["fleets"]
 get_declared_routes_collection = db["declared_routes"]
 notifications_collection = db["notifications_web_logs"]
 get_subscription_plans_collection = db["subscription_plans"]
+
+async_db = async_client["ridealertDB"]
+async_user_collection = async_db["users"]
+async_vehicle_collection = async_db["vehicles"]
+async_notification_logs_collection = async_db["notification_logs"]
+
+
+async def ensure_indexes():
+    """
+    Create the indexes behind the hot websocket/IoT queries. create_index is
+    a no-op when the index already exists, so this is safe on every startup.
+    """
+    # /ws/location: users tracking a vehicle, prefiltered by latitude band
+    await async_user_collection.create_index(
+        [("tracking_vehicle_id", ASCENDING), ("location.latitude", ASCENDING)])
+    # Vehicle counts, available/all vehicle lists: per-fleet status lookups
+    await async_vehicle_collection.create_index(
+        [("fleet_id", ASCENDING), ("status", ASCENDING)])
+    # /predict: vehicle lookup by IoT device
+    await async_vehicle_collection.create_index("device_id")
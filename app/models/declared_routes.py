@@ -1,8 +1,10 @@
 # In app/models/declared_routes.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 
 class DeclaredRouteModel(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
+
     id: str = Field(..., alias="_id")  # Map MongoDB _id to id
     company_id: str
     company_name: str
@@ -10,8 +12,4 @@ class DeclaredRouteModel(BaseModel):
     end_location: str
     landmark_details_start: Optional[str] = ""
     landmark_details_end: Optional[str] = ""
-    route_geojson: Optional[dict] = None
-    
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
\ No newline at end of file
+    route_geojson: Optional[dict] = None
\ No newline at end of file
@@ -22,6 +22,12 @@ async def send_verification_email(request: SendVerificationRequest):
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Too many verification attempts. Please try again in 15 minutes."
         )
+
+    if email_sender.verification_cooldown_active(request.email):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="A verification code was just sent. Please wait a minute before requesting another."
+        )
     
     # ✅ FIXED: Check Brevo configuration
     if not email_sender.brevo_api_key:
@@ -38,7 +44,7 @@ async def send_verification_email(request: SendVerificationRequest):
         email_sender.store_otp(request.email, otp)
         
         # Send email
-        success = email_sender.send_verification_email(request.email, otp)
+        success = await email_sender.send_verification_email(request.email, otp)
         
         if not success:
             raise HTTPException(
@@ -181,11 +181,16 @@ async def create_fleet(
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
 
-    # Validate subscription plan exists and is active
-    plan = plans_collection.find_one({
-        "plan_code": payload_obj.subscription_plan.upper(),
-        "is_active": True
-    })
+    # Validate subscription plan exists and is active. Price and vehicle
+    # limit are copied onto the fleet document here, once, so reads of a
+    # fleet never have to resolve them again.
+    plan = plans_collection.find_one(
+        {
+            "plan_code": payload_obj.subscription_plan.upper(),
+            "is_active": True
+        },
+        {"plan_code": 1, "price": 1, "max_vehicles": 1}
+    )
     
     if not plan:
         raise HTTPException(
@@ -211,7 +216,7 @@ async def create_fleet(
 
     # Prepare document with subscription plan details
     now = datetime.utcnow()
-    doc = payload_obj.dict()
+    doc = payload_obj.model_dump()
     doc.update({
         "created_at": now,
         "last_updated": now,
@@ -565,7 +570,7 @@ async def approve_fleet(fleet_id: str, current_user: dict = Depends(super_admin_
             if company_email and company_email != "N/A" and company_email != "N/A":
                 print(f"📨 Attempting to send approval email to: {company_email}")
                 # Send approval email
-                email_sent = approval_email_sender.send_approval_email(
+                email_sent = await approval_email_sender.send_approval_email(
                     company_email=company_email,
                     company_name=company_name,
                     login_credentials={
@@ -660,7 +665,7 @@ async def reject_fleet(fleet_id: str, current_user: dict = Depends(super_admin_r
         company_name = fleet.get('company_name', 'Valued Customer')
         
         if company_email and company_email != "N/A":
-            email_sent = rejection_email_sender.send_rejection_email(
+            email_sent = await rejection_email_sender.send_rejection_email(
                 company_email=company_email,
                 company_name=company_name
             )
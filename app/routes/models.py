@@ -33,9 +33,7 @@ async def reload_models():
             ml_manager.label_encoders = None
 
         # Reset background loader and restart
-        background_loader.load_complete = False
-        background_loader.load_error = None
-        background_loader.is_loading = False
+        background_loader.reset()
 
         # Start fresh background loading
         background_loader.start_background_loading()
@@ -52,9 +50,7 @@ async def clear_models():
         delete_all_models()
 
         # Reset background loader state
-        background_loader.load_complete = False
-        background_loader.load_error = None
-        background_loader.is_loading = False
+        background_loader.reset()
 
         # Reset in-memory models if available
         ml_manager = background_loader.get_ml_manager()
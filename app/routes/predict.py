@@ -10,7 +10,7 @@ from typing import Optional
 from app.database import db
 from app.utils.tracking_logs import insert_gps_log
 from app.utils.background_loader import background_loader
-from pydantic import BaseModel, Field, root_validator, ValidationError
+from pydantic import BaseModel, ConfigDict, Field, model_validator, ValidationError
 import time as _time
 from shapely.geometry import LineString, Point
 import threading
@@ -180,10 +180,10 @@ class PredictionRequest(BaseModel):
     LatitudeDegrees_gt: Optional[float] = None
     LongitudeDegrees_gt: Optional[float] = None
 
-    class Config:
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
-    @root_validator(pre=True)
+    @model_validator(mode="before")
+    @classmethod
     def normalize_speed_keys(cls, values):
         if "speed" not in values and "Speed" in values:
             values["speed"] = values["Speed"]
@@ -322,7 +322,7 @@ async def predict(request: EncryptedRequest):
             wls_z = prediction_request.WlsPositionZEcefMeters
 
         # Prepare input data
-        input_data = prediction_request.dict()
+        input_data = prediction_request.model_dump()
         input_data['WlsPositionXEcefMeters'] = wls_x
         input_data['WlsPositionYEcefMeters'] = wls_y
         input_data['WlsPositionZEcefMeters'] = wls_z
@@ -409,33 +409,33 @@ async def predict(request: EncryptedRequest):
             if ObjectId.is_valid(dev_id):
                 filter_query["$or"].append({"device_id": ObjectId(dev_id)})
 
-            vehicle = db.vehicles.find_one(filter_query)
+            # Look up and update the vehicle in one round trip; only its _id
+            # is needed back for the broadcast
+            vehicle = db.vehicles.find_one_and_update(
+                filter_query,
+                {
+                    "$set": {
+                        "location": {
+                            "latitude": float(snapped_lat),
+                            "longitude": float(snapped_lng)
+                        }
+                    }
+                },
+                projection={"_id": 1}
+            )
 
             if vehicle:
                 vehicle_id = str(vehicle["_id"])
 
-                update_result = db.vehicles.update_one(
-                    filter_query,
-                    {
-                        "$set": {
-                            "location": {
-                                "latitude": float(snapped_lat),
-                                "longitude": float(snapped_lng)
-                            }
-                        }
-                    }
-                )
+                print(
+                    f"🚗 Vehicle {prediction_request.device_id} snapped location updated: lat={snapped_lat:.6f}, lng={snapped_lng:.6f}")
 
-                if update_result.matched_count > 0:
-                    print(
-                        f"🚗 Vehicle {prediction_request.device_id} snapped location updated: lat={snapped_lat:.6f}, lng={snapped_lng:.6f}")
-
-                    await broadcast_vehicle_location_update(
-                        vehicle_id=vehicle_id,
-                        latitude=float(snapped_lat),
-                        longitude=float(snapped_lng),
-                        device_id=prediction_request.device_id
-                    )
+                await broadcast_vehicle_location_update(
+                    vehicle_id=vehicle_id,
+                    latitude=float(snapped_lat),
+                    longitude=float(snapped_lng),
+                    device_id=prediction_request.device_id
+                )
             else:
                 print(
                     f"⚠️ Warning: Vehicle {prediction_request.device_id} not found in vehicles collection")
@@ -458,7 +458,7 @@ async def predict(request: EncryptedRequest):
                 "longitude": snapped_lng
             }
 
-            ml_request_data = prediction_request.dict(by_alias=True)
+            ml_request_data = prediction_request.model_dump(by_alias=True)
             ml_request_data["WlsPositionXEcefMeters"] = wls_x
             ml_request_data["WlsPositionYEcefMeters"] = wls_y
             ml_request_data["WlsPositionZEcefMeters"] = wls_z
@@ -469,7 +469,7 @@ async def predict(request: EncryptedRequest):
                 "WlsPositionZEcefMeters": wls_z,
             }
 
-            log_id = insert_gps_log(
+            log_id = await insert_gps_log(
                 db=db,
                 device_id=prediction_request.device_id,
                 fleet_id=prediction_request.fleet_id,
@@ -36,7 +36,7 @@ async def create_subscription_plan(
         raise HTTPException(status_code=400, detail="Plan code already exists")
 
     now = datetime.utcnow()
-    doc = payload.dict()
+    doc = payload.model_dump()
     doc.update({
         "plan_code": payload.plan_code.upper(),  # Normalize to uppercase
         "created_at": now,
@@ -105,7 +105,7 @@ async def update_subscription_plan(
         raise HTTPException(status_code=400, detail="Invalid plan ID format")
 
     # Build update fields from non-None values
-    update_fields = {k: v for k, v in payload.dict(exclude_unset=True).items() if v is not None}
+    update_fields = {k: v for k, v in payload.model_dump(exclude_unset=True).items() if v is not None}
     
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields to update")
@@ -32,7 +32,7 @@ async def create_user(user: UserCreate):
     if user_collection.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    user_dict = user.dict()
+    user_dict = user.model_dump()
     user_dict["password"] = hash_password(user.password)
     user_dict["role"] = user.role or "user"
 
@@ -154,7 +154,7 @@ async def update_user_location_http(
     Background worker will handle notifications automatically based on stored locations.
     This endpoint is kept for frontend convenience but is NOT required for notifications.
     """
-    logger.info(f"📍 Manual location update received: {location_update.dict()}")
+    logger.info(f"📍 Manual location update received: {location_update.model_dump()}")
     
     # Extract user_id
     user_id = (
@@ -195,7 +195,7 @@ async def update_user_location_http(
     # Update DB location
     result = user_collection.update_one(
         {"_id": oid},
-        {"$set": {"location": location if isinstance(location, dict) else location.dict()}}
+        {"$set": {"location": location if isinstance(location, dict) else location.model_dump()}}
     )
     
     if result.modified_count == 0:
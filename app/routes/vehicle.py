@@ -6,6 +6,7 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import List
 from app.schemas.vehicle import VehicleTrackResponse, Location, VehicleStatus, VehicleBase, VehicleInDB
+from app.schemas.vehicle import STATUS_AVAILABLE, STATUS_UNAVAILABLE, STATUS_FULL
 from app.dependencies.roles import user_required, admin_required, user_or_admin_required, super_and_admin_required
 from bson import ObjectId
 from app.database import vehicle_collection, tracking_logs_collection, user_collection, notification_logs_collection
@@ -19,6 +20,10 @@ router = APIRouter(prefix="/vehicles", tags=["Vehicles"])
 
 active_eta_subscriptions: Dict[str, Dict] = {}
 
+# ETA/speed code only reads these from a tracking log; the rest of each
+# document (full IoT payload, ECEF, ...) is never decoded
+TRACKING_SPEED_FIELDS = {"_id": 0, "SpeedMps": 1, "timestamp": 1}
+
 class ETARequest(BaseModel):
     vehicle_id: str
     user_location: Location
@@ -151,21 +156,19 @@ def get_speed_history(device_id: str, minutes: int = 5) -> list:
     time_threshold = datetime.utcnow() - timedelta(minutes=minutes)
     timestamp_ms = int(time_threshold.timestamp() * 1000)
 
-    tracking_logs = list(tracking_logs_collection.find(
+    tracking_logs = tracking_logs_collection.find(
         {
             "device_id": device_id,
             "timestamp": {"$gte": timestamp_ms}
         },
+        {"_id": 0, "SpeedMps": 1},
         sort=[("timestamp", -1)],
         limit=30
-    ))
-
-    speeds = []
-    for log in tracking_logs:
-        speed = log.get("SpeedMps", 0.0)
-        speeds.append(speed)
+    )
 
-    return speeds
+    # Only the speed column is needed; read it straight off the cursor
+    # instead of holding every log document in a list first
+    return [log.get("SpeedMps", 0.0) for log in tracking_logs]
 
 
 def calculate_average_speed(speeds: list, percentile: float = 0.7) -> float:
@@ -345,6 +348,7 @@ async def calculate_vehicle_eta(
         # Get latest tracking log
         latest_tracking = tracking_logs_collection.find_one(
             {"device_id": device_id},
+            TRACKING_SPEED_FIELDS,
             sort=[("timestamp", -1)]
         )
 
@@ -449,7 +453,7 @@ async def subscribe_to_eta_updates(
 
     # Store the subscription
     active_eta_subscriptions[request.vehicle_id] = {
-        "user_location": request.user_location.dict(),
+        "user_location": request.user_location.model_dump(),
         "last_updated": datetime.utcnow(),
         "user_id": current_user.get("id")
     }
@@ -548,6 +552,7 @@ async def calculate_and_broadcast_eta(request: ETARequest, user_context: dict):
         if device_id:
             latest_tracking = tracking_logs_collection.find_one(
                 {"device_id": device_id},
+                TRACKING_SPEED_FIELDS,
                 sort=[("timestamp", -1)]
             )
 
@@ -710,7 +715,7 @@ async def create_vehicle_for_fleet(
         )
 
     # Convert to dict and enforce fleet_id
-    vehicle_dict = vehicle.dict()
+    vehicle_dict = vehicle.model_dump()
     vehicle_dict["fleet_id"] = fleet_id
 
     # Insert into DB
@@ -737,9 +742,9 @@ async def create_vehicle_for_fleet(
     ):
         await broadcast_available_vehicle_list(fleet_id)
 
-    # Return serialized vehicle
-    created_vehicle_dict = serialize_vehicle(created_vehicle)
-    return VehicleInDB(**created_vehicle_dict)
+    # Return serialized vehicle; FastAPI validates it against
+    # response_model once, so it isn't built as a VehicleInDB here too
+    return serialize_vehicle(created_vehicle)
 
 # @router.post("/create", response_model=VehicleInDB)
 # def create_vehicle(vehicle: VehicleBase, current_user: dict = Depends(admin_required)):
@@ -747,7 +752,7 @@ async def create_vehicle_for_fleet(
 #     if vehicle_collection.find_one({"plate": vehicle.plate}):
 #         raise HTTPException(status_code=400, detail="This vehicle license plate is existed already")
 
-#     vehicle_dict = vehicle.dict()
+#     vehicle_dict = vehicle.model_dump()
 #     result = vehicle_collection.insert_one(vehicle_dict)
 
 #     created_vehicle = vehicle_collection.find_one({"_id": result.inserted_id})
@@ -805,12 +810,8 @@ def get_all_vehicles(fleet_id: str, current_user: dict = Depends(user_or_admin_r
             ]
         })
 
-        vehicles = []
-        for vehicle in vehicles_cursor:
-            vehicle_data = serialize_vehicle(vehicle)
-            vehicles.append(VehicleInDB(**vehicle_data))
-
-        return vehicles
+        # Plain dicts: response_model validation is the single pass
+        return [serialize_vehicle(vehicle) for vehicle in vehicles_cursor]
 
     except Exception as e:
         raise HTTPException(
@@ -1224,6 +1225,14 @@ class IoTStatusUpdate(BaseModel):
     key: str
 
 
+_KEYPAD_STATUS = {
+    '1': (STATUS_FULL, "full"),
+    '2': (STATUS_AVAILABLE, "available"),
+    'A': (STATUS_AVAILABLE, "standing"),  # STANDING -> treat as available, keep detail
+    '4': (STATUS_UNAVAILABLE, "inactive"),  # INACTIVE -> treat as unavailable, keep detail
+}
+
+
 def _map_key_to_status_and_detail(key: str):
     """Map IoT keypad key to canonical status and optional detail string.
 
@@ -1231,15 +1240,7 @@ def _map_key_to_status_and_detail(key: str):
     existing filters and counts, and put nuance in `status_detail`.
     """
     k = (key or "").strip().upper()
-    if k == '1':
-        return (VehicleStatus.full.value, "full")
-    if k == '2':
-        return (VehicleStatus.available.value, "available")
-    if k == 'A':  # STANDING -> treat as available, keep detail
-        return (VehicleStatus.available.value, "standing")
-    if k == '4':  # INACTIVE -> treat as unavailable, keep detail
-        return (VehicleStatus.unavailable.value, "inactive")
-    return (None, None)
+    return _KEYPAD_STATUS.get(k, (None, None))
 
 
 # @router.post("/status/device/{device_id}")
@@ -1325,7 +1326,7 @@ async def update_status_by_device(device_id: str, payload: IoTStatusUpdate):
     loc = v_after.get("location") if v_after else None
     if (
         v_after
-        and v_after.get("status") == VehicleStatus.available.value
+        and v_after.get("status") == STATUS_AVAILABLE
         and isinstance(loc, dict)
         and loc.get("latitude") is not None
         and loc.get("longitude") is not None
@@ -1614,7 +1615,7 @@ async def iot_keypad_update(device_id: str, payload: IoTUnifiedUpdate):
         loc = v_after.get("location") if v_after else None
         if (
             v_after
-            and v_after.get("status") == VehicleStatus.available.value
+            and v_after.get("status") == STATUS_AVAILABLE
             and isinstance(loc, dict)
             and loc.get("latitude") is not None
             and loc.get("longitude") is not None
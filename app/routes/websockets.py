@@ -1,24 +1,151 @@
 from fastapi import WebSocket, WebSocketDisconnect, APIRouter
 from bson import ObjectId
-from pydantic import ValidationError
-from app.database import vehicle_collection, user_collection, db
-from app.schemas.vehicle import Location as VehicleLocation
-from app.schemas.user import Location as UserLocation
-from app.utils.notifications import check_and_notify
-from typing import Dict, List, Optional
+from bson.errors import InvalidId
+from app.database import async_vehicle_collection, async_user_collection
+from app.utils.notifications import check_and_notify, LatLng
+from app.utils.geo import bounding_box
+from app.utils.haversine import within_radius
+from app.utils.ws_pubsub import publish_vehicle_update
+from typing import Dict, List, Optional, Set, Union
 import asyncio
 from datetime import datetime
 import logging
-import json
+import orjson
 
 logger = logging.getLogger(__name__)
 
 ws_router = APIRouter(tags=["WebSocket"])
 
-vehicle_subscribers: Dict[str, List[WebSocket]] = {}
+vehicle_subscribers: Dict[str, Set[WebSocket]] = {}
 all_vehicle_updates_subscribers: List[WebSocket] = []
 fleet_subscribers: Dict[str, List[WebSocket]] = {}
-fleet_last_state: Dict[str, str] = {}
+fleet_last_state: Dict[str, bytes] = {}
+
+# Devices can stream GPS at 10+ Hz; persist and fan out at most this often per vehicle
+LOCATION_WRITE_INTERVAL = 0.5
+_last_location_write: Dict[str, float] = {}
+# Newest throttled fix per vehicle, written by a trailing task once the interval elapses
+_pending_locations: Dict[str, tuple] = {}
+_trailing_location_writes: Dict[str, asyncio.Task] = {}
+# Open /ws/location connections per vehicle; its throttle state is only
+# released once the last of them disconnects
+_location_streams: Dict[str, int] = {}
+
+# /ws/vehicle-counts subscribers and their prebuilt fleet filters, keyed by fleet_id
+vehicle_count_subscribers: Dict[str, List[WebSocket]] = {}
+vehicle_count_filters: Dict[str, dict] = {}
+VEHICLE_COUNTS_INTERVAL = 3
+# Change stream (re)open attempts in a row before falling back to polling
+VEHICLE_COUNTS_WATCH_ATTEMPTS = 5
+VEHICLE_COUNTS_MAX_BACKOFF = 60
+# Change-stream maintained counters: vehicle _id -> (fleet_id, status), and fleet_id -> status -> n
+_vehicle_count_states: Dict[object, tuple] = {}
+_fleet_status_counts: Dict[str, Dict[str, int]] = {}
+
+# /ws/vehicles/all subscribers keyed by fleet_id, refreshed by one shared task
+vehicle_list_subscribers: Dict[str, List[WebSocket]] = {}
+VEHICLE_LIST_INTERVAL = 5  # every 5 sec update
+
+# Outermost proximity notification tier (see check_and_notify)
+NOTIFY_RADIUS_M = 500
+# Cap on check_and_notify calls in flight at once across all connections,
+# to stay within the push provider's rate limits
+NOTIFY_CONCURRENCY = 32
+_notify_semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+
+# 1e-7 degrees is ~1 cm (NMEA scaling); rounding there keeps coordinates
+# short on the wire instead of 17 significant digits per float
+COORD_DECIMALS = 7
+
+# Location/subscribe messages are a few hundred bytes; anything bigger is
+# rejected before parsing so a misbehaving client can't force large allocations
+MAX_FRAME_BYTES = 8192
+
+# Only the fields the vehicle-list sockets actually send; vehicle documents
+# also carry things like uploaded files that shouldn't be decoded every poll
+VEHICLE_LIST_FIELDS = ("location", "available_seats", "status", "route",
+                       "driverName", "bound_for", "plate")
+VEHICLE_LIST_PROJECTION = {field: 1 for field in VEHICLE_LIST_FIELDS}
+AVAILABLE_VEHICLE_PROJECTION = {**VEHICLE_LIST_PROJECTION, "status_detail": 1}
+
+
+def encode_json(payload) -> str:
+    """Encode a websocket payload with orjson (ObjectIds and other extras fall back to str)"""
+    return orjson.dumps(payload, default=str).decode()
+
+
+async def send_orjson(websocket: WebSocket, payload):
+    await websocket.send_text(encode_json(payload))
+
+
+async def receive_json_frame(websocket: WebSocket, max_bytes: int = MAX_FRAME_BYTES) -> dict:
+    """Receive one frame and parse it as a JSON object.
+
+    Raises ValueError if the frame is too large or isn't a JSON object.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+
+    text = message.get("text")
+    if text is not None:
+        # len() of a str counts characters, which undercounts multi-byte
+        # UTF-8; frames already over the limit in characters are rejected
+        # without being encoded, the rest are measured in bytes below
+        if len(text) > max_bytes:
+            raise ValueError("Message too large")
+        raw = text.encode()
+    else:
+        raw = message.get("bytes") or b""
+    if len(raw) > max_bytes:
+        raise ValueError("Message too large")
+
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        raise ValueError("Invalid JSON")
+    if not isinstance(data, dict):
+        raise ValueError("Invalid JSON")
+    return data
+
+
+def parse_location(data: dict) -> LatLng:
+    """
+    Validate a {"latitude", "longitude"} payload without building a model.
+
+    Raises KeyError/TypeError/ValueError on missing, non-numeric or
+    out-of-range coordinates.
+    """
+    lat = float(data["latitude"])
+    lng = float(data["longitude"])
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        raise ValueError("Coordinates out of range")
+    return LatLng(round(lat, COORD_DECIMALS), round(lng, COORD_DECIMALS))
+
+
+async def wait_for_disconnect(websocket: WebSocket):
+    """Park a push-only connection until the client goes away.
+
+    Liveness is handled by uvicorn's protocol-level pings (see the
+    Dockerfile), so clients don't need to send anything; any frame they do
+    send is dropped without being decoded.
+    """
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+async def iter_json_frames(websocket: WebSocket, max_bytes: int = MAX_FRAME_BYTES):
+    """Yield parsed JSON frames until the client disconnects.
+
+    Rejected frames are answered with the error text and skipped.
+    """
+    while True:
+        try:
+            yield await receive_json_frame(websocket, max_bytes)
+        except WebSocketDisconnect:
+            return
+        except ValueError as e:
+            await websocket.send_text(str(e))
 
 async def get_available_vehicles(fleet_id: str) -> List[dict]:
     """Fetch available vehicles with locations"""
@@ -29,7 +156,7 @@ async def get_available_vehicles(fleet_id: str) -> List[dict]:
     }
     
     vehicles = []
-    for vehicle in vehicle_collection.find(query):
+    async for vehicle in async_vehicle_collection.find(query, AVAILABLE_VEHICLE_PROJECTION):
         # Only include available and full vehicles
         status = vehicle.get("status", "unavailable")
         if status in ["available", "full"]:
@@ -52,7 +179,7 @@ async def broadcast_to_fleet(fleet_id: str, vehicles: List[dict]) -> bool:
     if fleet_id not in fleet_subscribers or not fleet_subscribers[fleet_id]:
         return False
     
-    current_state = json.dumps(vehicles, sort_keys=True, default=str)
+    current_state = orjson.dumps(vehicles, option=orjson.OPT_SORT_KEYS, default=str)
     
     # Only send if state changed
     if fleet_last_state.get(fleet_id) == current_state:
@@ -70,26 +197,42 @@ async def broadcast_to_fleet(fleet_id: str, vehicles: List[dict]) -> bool:
     
     for ws in subscribers:
         try:
-            await ws.send_json(data)
+            await send_orjson(ws, data)
         except (WebSocketDisconnect, RuntimeError) as e:
-            logger.debug(f"Error sending to subscriber: {e}")
+            logger.debug("Error sending to subscriber: %s", e)
             disconnected.append(ws)
     
     # Remove disconnected clients
     for ws in disconnected:
-        try:
-            if ws in fleet_subscribers[fleet_id]:
-                fleet_subscribers[fleet_id].remove(ws)
-        except (KeyError, ValueError):
-            pass
-    
-    # Cleanup if no more subscribers
-    if fleet_id in fleet_subscribers and not fleet_subscribers[fleet_id]:
-        fleet_subscribers.pop(fleet_id, None)
-        fleet_last_state.pop(fleet_id, None)
+        remove_fleet_subscriber(fleet_id, ws)
     
     return True
 
+def remove_fleet_subscriber(fleet_id: str, websocket: WebSocket):
+    """Drop a socket from a fleet's subscribers, pruning the empty entry and its cached state"""
+    subs = fleet_subscribers.get(fleet_id)
+    if subs and websocket in subs:
+        subs.remove(websocket)
+        if not subs:
+            fleet_subscribers.pop(fleet_id, None)
+            fleet_last_state.pop(fleet_id, None)
+
+
+def remove_vehicle_subscriber(vehicle_id: str, websocket: WebSocket):
+    """Drop a socket from a vehicle's subscribers, pruning the empty entry"""
+    subs = vehicle_subscribers.get(vehicle_id)
+    if subs is not None:
+        subs.discard(websocket)
+        if not subs:
+            vehicle_subscribers.pop(vehicle_id, None)
+
+
+def remove_global_subscriber(websocket: WebSocket):
+    """Drop a socket from the all-vehicles location subscribers"""
+    if websocket in all_vehicle_updates_subscribers:
+        all_vehicle_updates_subscribers.remove(websocket)
+
+
 async def broadcast_vehicle_location_update(vehicle_id: str, latitude: float, longitude: float, device_id: str = None):
     """Broadcast vehicle location update to all subscribers"""
     
@@ -98,115 +241,244 @@ async def broadcast_vehicle_location_update(vehicle_id: str, latitude: float, lo
         "type": "location_update",
         "vehicle_id": vehicle_id,
         "device_id": device_id or vehicle_id,  # Use vehicle_id as fallback
-        "latitude": latitude,
-        "longitude": longitude,
+        "latitude": round(latitude, COORD_DECIMALS),
+        "longitude": round(longitude, COORD_DECIMALS),
         "timestamp": datetime.utcnow().isoformat()
     }
     
+    # Encode once; the same text goes to Redis and every local subscriber
+    update_text = encode_json(update_message)
+
+    # With Redis configured every worker (including this one) delivers it
+    if await publish_vehicle_update(vehicle_id, update_text, include_global=True):
+        return
+
+    await fan_out_vehicle_update(vehicle_id, update_text, include_global=True)
+
+
+async def send_to_all(sockets: List[WebSocket], message: Union[dict, str]) -> List[WebSocket]:
+    """Send one message (dict or pre-encoded JSON text) to many sockets concurrently; returns the sockets that failed"""
+    if not sockets:
+        return []
+    text = message if isinstance(message, str) else encode_json(message)
+    results = await asyncio.gather(
+        *(ws.send_text(text) for ws in sockets), return_exceptions=True)
+    failed = []
+    for ws, result in zip(sockets, results):
+        if isinstance(result, Exception):
+            logger.debug("Error sending to subscriber: %s", result)
+            failed.append(ws)
+    return failed
+
+
+async def fan_out_vehicle_update(vehicle_id: str, message: Union[dict, str], include_global: bool = False):
+    """Send an update to this worker's subscribers of a vehicle (and optionally all-vehicle subscribers)"""
     # Broadcast to vehicle-specific subscribers
-    if vehicle_id in vehicle_subscribers:
-        subscribers = vehicle_subscribers[vehicle_id].copy()
-        for ws in subscribers:
-            try:
-                await ws.send_json(update_message)
-            except (WebSocketDisconnect, RuntimeError):
-                # Remove disconnected clients
-                if ws in vehicle_subscribers[vehicle_id]:
-                    vehicle_subscribers[vehicle_id].remove(ws)
-    
-    # Broadcast to global subscribers
-    global_subscribers = all_vehicle_updates_subscribers.copy()
-    for ws in global_subscribers:
-        try:
-            await ws.send_json(update_message)
-        except (WebSocketDisconnect, RuntimeError):
-            if ws in all_vehicle_updates_subscribers:
-                all_vehicle_updates_subscribers.remove(ws)
+    subscribers = list(vehicle_subscribers.get(vehicle_id, ()))
+    if include_global:
+        global_subscribers = all_vehicle_updates_subscribers.copy()
+    else:
+        global_subscribers = []
+
+    failed = await send_to_all(subscribers + global_subscribers, message)
+
+    # Remove disconnected clients once every send has settled
+    for ws in failed:
+        remove_vehicle_subscriber(vehicle_id, ws)
+        remove_global_subscriber(ws)
+
+async def notify_user(user_id, user_location: dict, vehicle_location: LatLng):
+    """Run one check_and_notify under the shared concurrency cap"""
+    async with _notify_semaphore:
+        return await check_and_notify(
+            str(user_id),
+            LatLng(user_location["latitude"], user_location["longitude"]),
+            vehicle_location
+        )
+
+
+async def store_vehicle_location(vehicle_id: str, oid: ObjectId, location: LatLng, loc_dict: dict):
+    """
+    Write a fix to MongoDB, notify nearby trackers and broadcast it.
+
+    Returns the encoded update (None if the vehicle doesn't exist) and the
+    exceptions raised by check_and_notify.
+    """
+    _last_location_write[vehicle_id] = asyncio.get_running_loop().time()
+
+    # Update vehicle's location in MongoDB
+    result = await async_vehicle_collection.update_one(
+        {"_id": oid},
+        {"$set": {"location": loc_dict}}
+    )
+
+    # Notify users tracking this vehicle; only those inside the notify
+    # radius's bounding box are fetched, and the box's corners are dropped
+    # with the cheap radius check before check_and_notify runs haversine
+    min_lat, max_lat, min_lng, max_lng = bounding_box(
+        location.latitude, location.longitude, NOTIFY_RADIUS_M)
+    tracking_users = async_user_collection.find(
+        {
+            "tracking_vehicle_id": vehicle_id,
+            "location.latitude": {"$gte": min_lat, "$lte": max_lat},
+            "location.longitude": {"$gte": min_lng, "$lte": max_lng}
+        },
+        {"_id": 1, "location": 1}
+    )
+    notify_results = await asyncio.gather(
+        *[
+            notify_user(user["_id"], user["location"], location)
+            async for user in tracking_users
+            if user.get("location") and within_radius(
+                user["location"]["latitude"], user["location"]["longitude"],
+                location.latitude, location.longitude, NOTIFY_RADIUS_M)
+        ],
+        return_exceptions=True
+    )
+    errors = [outcome for outcome in notify_results if isinstance(outcome, Exception)]
+
+    if result.matched_count != 1:
+        return None, errors
+
+    # Broadcast to all subscribers of this vehicle
+    update_text = encode_json({
+        "vehicle_id": vehicle_id,
+        "location": loc_dict,
+        "updated": result.modified_count == 1
+    })
+    if not await publish_vehicle_update(vehicle_id, update_text):
+        await fan_out_vehicle_update(vehicle_id, update_text)
+    return update_text, errors
+
+
+async def flush_pending_location(vehicle_id: str):
+    """Write the newest throttled fix of a vehicle, if any"""
+    pending = _pending_locations.pop(vehicle_id, None)
+    if pending is None:
+        return
+    try:
+        update_text, errors = await store_vehicle_location(vehicle_id, *pending)
+    except Exception:
+        logger.exception("Trailing location write failed for vehicle %s", vehicle_id)
+        return
+    if update_text is None:
+        logger.warning("Vehicle %s not found for trailing location write", vehicle_id)
+    for error in errors:
+        logger.warning("Error in check_and_notify for vehicle %s: %s", vehicle_id, error)
+
+
+async def _trailing_location_write(vehicle_id: str, delay: float):
+    await asyncio.sleep(delay)
+    _trailing_location_writes.pop(vehicle_id, None)
+    await flush_pending_location(vehicle_id)
+
+
+async def release_vehicle_location(vehicle_id: str):
+    """
+    Called when a connection streaming this vehicle closes. Once no other
+    connection is streaming it, flush its throttled fix now and drop its
+    throttle state.
+    """
+    remaining = _location_streams.get(vehicle_id, 1) - 1
+    if remaining > 0:
+        _location_streams[vehicle_id] = remaining
+        return
+    _location_streams.pop(vehicle_id, None)
+
+    task = _trailing_location_writes.pop(vehicle_id, None)
+    if task is not None:
+        task.cancel()
+    await flush_pending_location(vehicle_id)
+    _last_location_write.pop(vehicle_id, None)
+
 
 @ws_router.websocket("/ws/location")
 async def update_location(websocket: WebSocket):
     await websocket.accept()
+    # A device sends the same vehicle_id for the whole connection, so each
+    # id is parsed into an ObjectId once per session instead of per message
+    oid_cache: Dict[str, ObjectId] = {}
     try:
-        while True:
-            data = await websocket.receive_json()
-
+        async for data in iter_json_frames(websocket):
             vehicle_id = data.get("vehicle_id")
             location_data = data.get("location")
 
             # Validate ObjectId
-            try:
-                oid = ObjectId(vehicle_id)
-            except Exception:
-                await websocket.send_text("Invalid vehicle_id format")
-                continue
+            oid = oid_cache.get(vehicle_id) if isinstance(vehicle_id, str) else None
+            if oid is None:
+                try:
+                    oid = ObjectId(vehicle_id)
+                except Exception:
+                    await websocket.send_text("Invalid vehicle_id format")
+                    continue
+                oid_cache[vehicle_id] = oid
+                _location_streams[vehicle_id] = _location_streams.get(vehicle_id, 0) + 1
 
-            # Debug: print all vehicle IDs in the collection
-            print("Looking for vehicle:", oid)
-            print("All vehicle IDs:", [str(v["_id"])
-                  for v in vehicle_collection.find({}, {"_id": 1})])
+            logger.debug("Looking for vehicle %s", oid)
 
             # Validate location structure
             try:
-                location = VehicleLocation(**location_data)
-            except ValidationError:
+                location = parse_location(location_data)
+                last_updated = location_data.get("last_updated")
+                if last_updated is not None:
+                    last_updated = int(last_updated)
+            except (KeyError, TypeError, ValueError):
                 await websocket.send_text("Invalid location format")
                 continue
 
-            # Update vehicle's location in MongoDB
-            result = vehicle_collection.update_one(
-                {"_id": oid},
-                {"$set": {"location": location.dict()}}
-            )
+            # Built once and reused for the DB write, broadcast and echo
+            loc_dict = {
+                "latitude": location.latitude,
+                "longitude": location.longitude,
+                "last_updated": last_updated
+            }
+
+            # Coalesce bursts: write/notify at most once per
+            # LOCATION_WRITE_INTERVAL for each vehicle, and have a trailing
+            # task write the newest throttled fix once the interval is over
+            wait = LOCATION_WRITE_INTERVAL - (
+                asyncio.get_running_loop().time() - _last_location_write.get(vehicle_id, float("-inf")))
+            if wait > 0:
+                _pending_locations[vehicle_id] = (oid, location, loc_dict)
+                if vehicle_id not in _trailing_location_writes:
+                    _trailing_location_writes[vehicle_id] = asyncio.create_task(
+                        _trailing_location_write(vehicle_id, wait))
+                await send_orjson(websocket, {
+                    "vehicle_id": vehicle_id,
+                    "location": loc_dict,
+                    "throttled": True
+                })
+                continue
+
+            # This fix supersedes any throttled one still waiting
+            _pending_locations.pop(vehicle_id, None)
+            task = _trailing_location_writes.pop(vehicle_id, None)
+            if task is not None:
+                task.cancel()
 
-            # Notify all users tracking this vehicle
-            tracking_users = user_collection.find(
-                {"tracking_vehicle_id": vehicle_id})
-            for user in tracking_users:
-                user_location = user.get("location")
-                if user_location:
-                    try:
-                        await check_and_notify(
-                            str(user["_id"]),
-                            type("UserLoc", (), user_location)(),
-                            location
-                        )
-                    except Exception as e:
-                        await websocket.send_text(f"Error in check_and_notify: {e}")
-
-            # After updating the vehicle's location in MongoDB
-            if result.matched_count == 1:
-                # Broadcast to all subscribers of this vehicle
-                subscribers = vehicle_subscribers.get(vehicle_id, [])
-                for ws in subscribers:
-                    try:
-                        await ws.send_json({
-                            "vehicle_id": vehicle_id,
-                            "location": location.dict(),
-                            "updated": result.modified_count == 1
-                        })
-                    except Exception as e:
-                        print(f"Error sending to subscriber: {e}")
+            update_text, errors = await store_vehicle_location(vehicle_id, oid, location, loc_dict)
+            for error in errors:
+                await websocket.send_text(f"Error in check_and_notify: {error}")
 
+            if update_text is not None:
                 # Optionally, also send a response to the sender
-                await websocket.send_json({
-                    "vehicle_id": vehicle_id,
-                    "location": location.dict(),
-                    "updated": result.modified_count == 1
-                })
+                await websocket.send_text(update_text)
             else:
                 await websocket.send_text(f"Vehicle {vehicle_id} not found")
-
     except WebSocketDisconnect:
-        print("Vehicle client disconnected")
+        pass
+    finally:
+        for vehicle_id in oid_cache:
+            await release_vehicle_location(vehicle_id)
+
+    logger.info("Vehicle client disconnected")
 
 
 @ws_router.websocket("/ws/user-location")
 async def update_user_location(websocket: WebSocket):
     await websocket.accept()
     try:
-        while True:
-            data = await websocket.receive_json()
-
+        async for data in iter_json_frames(websocket):
             user_id = data.get("user_id")
             location_data = data.get("location")
 
@@ -219,29 +491,29 @@ async def update_user_location(websocket: WebSocket):
 
             # Validate location schema
             try:
-                location = UserLocation(**location_data)
-            except ValidationError:
+                location = parse_location(location_data)
+            except (KeyError, TypeError, ValueError):
                 await websocket.send_text("The user location is invalid")
                 continue
 
             # Check if user actually exists before updating
-            user = user_collection.find_one({"_id": oid})
+            user = await async_user_collection.find_one({"_id": oid})
             if not user:
                 await websocket.send_text(f"User {user_id} not found")
                 continue
 
             # Ensure fleet_id exists
             if not user.get("fleet_id"):
-                logger.error(f"No fleet_id for user {user_id}")
+                logger.error("No fleet_id for user %s", user_id)
                 await websocket.send_text("User missing fleet_id")
                 continue
 
             fleet_id = user["fleet_id"]  # ObjectId or str
 
             # Update location
-            result = user_collection.update_one(
+            result = await async_user_collection.update_one(
                 {"_id": oid},
-                {"$set": {"location": location.dict()}}
+                {"$set": {"location": location._asdict()}}
             )
 
             if result.modified_count == 1:
@@ -258,10 +530,11 @@ async def update_user_location(websocket: WebSocket):
                             {"location.longitude": {"$exists": True, "$ne": None}}
                         ]
                     }
-                    vehicles = list(vehicle_collection.find(fleet_query))
+                    vehicles = await async_vehicle_collection.find(fleet_query).to_list(None)
 
-                    logger.info(
-                        f"Checking proximity for user {user_id} against {len(vehicles)} vehicles in fleet {fleet_id}")
+                    logger.debug(
+                        "Checking proximity for user %s against %d vehicles in fleet %s",
+                        user_id, len(vehicles), fleet_id)
 
                     # For each vehicle, check distance and notify if close
                     notified_count = 0
@@ -271,26 +544,27 @@ async def update_user_location(websocket: WebSocket):
                         if vehicle_loc and vehicle_loc.get("latitude") and vehicle_loc.get("longitude"):
                             success = await check_and_notify(
                                 str(oid),  # user_id
-                                location,  # UserLocation object
-                                # Mock for VehicleLocation
-                                type("VehicleLoc", (), vehicle_loc)(),
+                                location,  # User LatLng
+                                LatLng(vehicle_loc["latitude"], vehicle_loc["longitude"]),
                                 vehicle_id  # For anti-spam
                             )
                             if success:
                                 notified_count += 1
 
-                    logger.info(
-                        f"Proximity checks complete for user {user_id}: {notified_count} notifications sent")
+                    logger.debug(
+                        "Proximity checks complete for user %s: %d notifications sent",
+                        user_id, notified_count)
 
                 except Exception as check_err:
                     logger.error(
-                        f"Error in proximity checks for user {user_id}: {check_err}")
+                        "Error in proximity checks for user %s: %s", user_id, check_err)
                     await websocket.send_text(f"Proximity check failed: {check_err}")
             else:
                 await websocket.send_text(f"No location change made for user {user_id}")
-
     except WebSocketDisconnect:
-        print("User client is disconnected")
+        pass
+
+    logger.info("User client is disconnected")
 
 # para track ang vehicles continuously no need to reload
 
@@ -300,129 +574,294 @@ async def track_vehicle_ws(websocket: WebSocket):
     await websocket.accept()
     vehicle_id = None
     try:
-        data = await websocket.receive_json()
+        try:
+            data = await receive_json_frame(websocket)
+        except ValueError as e:
+            await websocket.send_text(str(e))
+            await websocket.close()
+            return
         vehicle_id = data.get("vehicle_id")
         if not vehicle_id:
             await websocket.send_text("vehicle_id required")
             await websocket.close()
             return
 
-        if vehicle_id not in vehicle_subscribers:
-            vehicle_subscribers[vehicle_id] = []
-        vehicle_subscribers[vehicle_id].append(websocket)
+        vehicle_subscribers.setdefault(vehicle_id, set()).add(websocket)
 
-        while True:
-            # Keep connection alive so that it receive always.
-            await websocket.receive_text()
+        await wait_for_disconnect(websocket)
     except WebSocketDisconnect:
-        if vehicle_id and vehicle_id in vehicle_subscribers:
-            subs = vehicle_subscribers[vehicle_id]
-            if websocket in subs:
-                subs.remove(websocket)
-                if not subs:
-                    vehicle_subscribers.pop(vehicle_id)
-        print("Vehicle tracking client disconnected from user")
+        pass
+    finally:
+        if vehicle_id:
+            remove_vehicle_subscriber(vehicle_id, websocket)
+    logger.info("Vehicle tracking client disconnected from user")
+
 
 # para count tanan vehicles continuously (bisan newly created) no need to reload
+def fleet_id_filter(fleet_id: str) -> dict:
+    """Match vehicles whose fleet_id is stored either as ObjectId or as string"""
+    # Try converting to ObjectId, fallback to string
+    try:
+        fleet_obj_id = ObjectId(fleet_id)
+    except InvalidId:
+        return {"fleet_id": fleet_id}
+    return {"$or": [{"fleet_id": fleet_obj_id}, {"fleet_id": fleet_id}]}
+
+
+def vehicle_counts_payload(fleet_id: str, buckets: Dict[str, int]) -> dict:
+    return {
+        "fleet_id": fleet_id,
+        "total": sum(buckets.values()),
+        "available": buckets.get("available", 0),
+        "full": buckets.get("full", 0),
+        "unavailable": buckets.get("unavailable", 0)
+    }
+
+
+async def count_fleet_vehicles(fleet_id: str, fleet_query: dict) -> dict:
+    """Count a fleet's vehicles per status in a single aggregation round-trip"""
+    pipeline = [
+        {"$match": fleet_query},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+    ]
+    buckets = {
+        doc["_id"]: doc["n"]
+        async for doc in async_vehicle_collection.aggregate(pipeline)
+    }
+    return vehicle_counts_payload(fleet_id, buckets)
+
+
+async def send_vehicle_counts(fleet_id: str, counts: dict):
+    """Send counts to every subscriber of a fleet, dropping dead sockets"""
+    subscribers = vehicle_count_subscribers.get(fleet_id, []).copy()
+    for ws in await send_to_all(subscribers, counts):
+        remove_vehicle_count_subscriber(fleet_id, ws)
+
+
+def remove_vehicle_count_subscriber(fleet_id: str, websocket: WebSocket):
+    subs = vehicle_count_subscribers.get(fleet_id)
+    if subs and websocket in subs:
+        subs.remove(websocket)
+        if not subs:
+            vehicle_count_subscribers.pop(fleet_id, None)
+            vehicle_count_filters.pop(fleet_id, None)
+
+
+def _set_vehicle_count_state(vehicle_id, state: Optional[tuple]):
+    """Move one vehicle between (fleet_id, status) buckets and return the fleets touched"""
+    touched = set()
+    previous = _vehicle_count_states.pop(vehicle_id, None)
+    if previous is not None:
+        fleet_key, status = previous
+        _fleet_status_counts[fleet_key][status] -= 1
+        touched.add(fleet_key)
+    if state is not None:
+        fleet_key, status = state
+        _vehicle_count_states[vehicle_id] = state
+        buckets = _fleet_status_counts.setdefault(fleet_key, {})
+        buckets[status] = buckets.get(status, 0) + 1
+        touched.add(fleet_key)
+    return touched
+
+
+def _fleet_counts(fleet_id: str) -> dict:
+    buckets = {
+        status: n
+        for status, n in _fleet_status_counts.get(fleet_id, {}).items() if n
+    }
+    return vehicle_counts_payload(fleet_id, buckets)
+
 
+def _vehicle_count_state(document: dict) -> tuple:
+    return (str(document.get("fleet_id")), document.get("status"))
+
+
+async def _watch_vehicle_counts(opened: asyncio.Event):
+    """
+    Keep per-fleet status counters in memory from a change stream and push
+    them to subscribers as soon as a vehicle is added, removed or changes
+    status or fleet. Location-only updates are filtered out server-side.
+
+    Sets `opened` once the stream is open and the counters are seeded.
+    """
+    pipeline = [{"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {
+            "operationType": "update",
+            "$or": [
+                {"updateDescription.updatedFields.status": {"$exists": True}},
+                {"updateDescription.updatedFields.fleet_id": {"$exists": True}}
+            ]
+        }
+    ]}}]
+
+    async with async_vehicle_collection.watch(pipeline) as stream:
+        # Snapshot after the stream is open so no change falls in between
+        _vehicle_count_states.clear()
+        _fleet_status_counts.clear()
+        async for vehicle in async_vehicle_collection.find({}, {"fleet_id": 1, "status": 1}):
+            _set_vehicle_count_state(vehicle["_id"], _vehicle_count_state(vehicle))
+        for fleet_id in list(vehicle_count_subscribers.keys()):
+            await send_vehicle_counts(fleet_id, _fleet_counts(fleet_id))
+        opened.set()
+
+        async for change in stream:
+            vehicle_id = change["documentKey"]["_id"]
+            operation = change["operationType"]
+
+            if operation == "delete":
+                touched = _set_vehicle_count_state(vehicle_id, None)
+            elif operation == "update" and vehicle_id in _vehicle_count_states:
+                fields = change["updateDescription"]["updatedFields"]
+                fleet_key, status = _vehicle_count_states[vehicle_id]
+                if "fleet_id" in fields:
+                    fleet_key = str(fields["fleet_id"])
+                status = fields.get("status", status)
+                touched = _set_vehicle_count_state(vehicle_id, (fleet_key, status))
+            elif operation == "update":
+                # Not in the snapshot; the update only carries the changed
+                # field, so read the vehicle's fleet and status back
+                document = await async_vehicle_collection.find_one(
+                    {"_id": vehicle_id}, {"fleet_id": 1, "status": 1})
+                touched = _set_vehicle_count_state(
+                    vehicle_id, _vehicle_count_state(document) if document else None)
+            else:
+                touched = _set_vehicle_count_state(
+                    vehicle_id, _vehicle_count_state(change["fullDocument"]))
+
+            for fleet_id in touched:
+                if fleet_id in vehicle_count_subscribers:
+                    await send_vehicle_counts(fleet_id, _fleet_counts(fleet_id))
+
+
+async def _poll_vehicle_counts(interval: int):
+    """Fallback for deployments without change streams (standalone mongod)"""
+    while True:
+        for fleet_id in list(vehicle_count_subscribers.keys()):
+            fleet_query = vehicle_count_filters.get(fleet_id)
+            if fleet_query is None:
+                continue
+            try:
+                counts = await count_fleet_vehicles(fleet_id, fleet_query)
+            except Exception as e:
+                counts = {"error": str(e)}
+            await send_vehicle_counts(fleet_id, counts)
+
+        await asyncio.sleep(interval)
+
+
+async def vehicle_counts_broadcaster(interval: int = VEHICLE_COUNTS_INTERVAL):
+    """
+    Single background task that keeps every /ws/vehicle-counts client up to
+    date. Uses a change stream when the server supports it, re-opening it
+    with backoff if it dies, and only falls back to polling each subscribed
+    fleet once per tick after it fails to open several times in a row.
+    """
+    failures = 0
+    while failures < VEHICLE_COUNTS_WATCH_ATTEMPTS:
+        opened = asyncio.Event()
+        try:
+            await _watch_vehicle_counts(opened)
+            logger.warning("Vehicle counts change stream closed; reopening")
+        except Exception as e:
+            logger.warning("Vehicle counts change stream failed: %s", e)
+        failures = 0 if opened.is_set() else failures + 1
+        if failures < VEHICLE_COUNTS_WATCH_ATTEMPTS:
+            await asyncio.sleep(min(VEHICLE_COUNTS_MAX_BACKOFF, 2 ** failures))
+
+    logger.warning(
+        "Vehicle counts change stream unavailable; polling every %ss", interval)
+    await _poll_vehicle_counts(interval)
 
-# @ws_router.websocket("/ws/vehicle-counts")
-# async def vehicle_counts_ws(websocket: WebSocket):
-#     await websocket.accept()
-#     try:
-#         while True:
-#             # Query DB for counts
-#             total = vehicle_collection.count_documents({})
-#             available = vehicle_collection.count_documents(
-#                 {"status": "available"})
-#             full = vehicle_collection.count_documents({"status": "full"})
-#             unavailable = vehicle_collection.count_documents(
-#                 {"status": "unavailable"})
-
-#             await websocket.send_json({
-#                 "total": total,
-#                 "available": available,
-#                 "full": full,
-#                 "unavailable": unavailable
-#             })
-
-#             # You can tune this interval or replace with a change-stream if Mongo supports it
-#             await asyncio.sleep(5)
-#     except WebSocketDisconnect:
-#         print("Vehicle count client disconnected")
 
 @ws_router.websocket("/ws/vehicle-counts/{fleet_id}")
 async def vehicle_counts_ws(websocket: WebSocket, fleet_id: str):
     await websocket.accept()
+
+    # fleet_id is fixed for the lifetime of the connection, so build its
+    # filter once and share it with the broadcaster
+    if fleet_id not in vehicle_count_filters:
+        vehicle_count_filters[fleet_id] = fleet_id_filter(fleet_id)
+    vehicle_count_subscribers.setdefault(fleet_id, []).append(websocket)
+
     try:
-        while True:
-            try:
-                # Try converting to ObjectId, fallback to string
-                try:
-                    fleet_obj_id = ObjectId(fleet_id)
-                except:
-                    fleet_obj_id = fleet_id
-
-                # Query vehicles where fleet_id matches either string or ObjectId
-                vehicles = list(vehicle_collection.find({
-                    "$or": [
-                        {"fleet_id": fleet_obj_id},
-                        {"fleet_id": str(fleet_obj_id)}
-                    ]
-                }))
-
-                total = len(vehicles)
-                available = sum(1 for v in vehicles if v.get(
-                    "status") == "available")
-                full = sum(1 for v in vehicles if v.get("status") == "full")
-                unavailable = sum(1 for v in vehicles if v.get(
-                    "status") == "unavailable")
-
-                await websocket.send_json({
-                    "fleet_id": fleet_id,
-                    "total": total,
-                    "available": available,
-                    "full": full,
-                    "unavailable": unavailable
-                })
-            except Exception as e:
-                try:
-                    await websocket.send_json({"error": str(e)})
-                except (WebSocketDisconnect, RuntimeError):
-                    break  # Stop sending if disconnected
+        # Send initial counts immediately, the broadcaster takes over after
+        try:
+            counts = await count_fleet_vehicles(fleet_id, vehicle_count_filters[fleet_id])
+        except Exception as e:
+            counts = {"error": str(e)}
+        await send_orjson(websocket, counts)
 
-            await asyncio.sleep(3)  # update every 3 seconds
+        await wait_for_disconnect(websocket)
     except WebSocketDisconnect:
-        print(f"Client disconnected from {fleet_id} vehicle count stream")
+        pass
+    finally:
+        remove_vehicle_count_subscriber(fleet_id, websocket)
+    logger.info("Client disconnected from %s vehicle count stream", fleet_id)
+
+
+# para makita tanan vehicles continuously (bisan newly created) no need to reload
+async def get_fleet_vehicles(fleet_id: str) -> List[dict]:
+    """Fetch every vehicle of a fleet for the /ws/vehicles/all list"""
+    vehicles = []
+    async for vehicle in async_vehicle_collection.find(
+            {"fleet_id": fleet_id}, VEHICLE_LIST_PROJECTION):
+        vehicles.append({
+            "id": str(vehicle["_id"]),
+            "location": vehicle.get("location"),  # can be None
+            "available_seats": vehicle.get("available_seats", 0),
+            "status": vehicle.get("status", "unavailable"),
+            "route": vehicle.get("route", ""),
+            "driverName": vehicle.get("driverName", ""),
+            "bound_for": vehicle.get("bound_for"),
+            "plate": vehicle.get("plate", "")
+        })
+    return vehicles
+
+
+def remove_vehicle_list_subscriber(fleet_id: str, websocket: WebSocket):
+    subs = vehicle_list_subscribers.get(fleet_id)
+    if subs and websocket in subs:
+        subs.remove(websocket)
+        if not subs:
+            vehicle_list_subscribers.pop(fleet_id, None)
+
+
+async def vehicle_list_broadcaster(interval: int = VEHICLE_LIST_INTERVAL):
+    """
+    Single background task behind /ws/vehicles/all: each subscribed fleet is
+    queried and encoded once per tick and the same text goes to all of its
+    clients, instead of every client running its own find() loop.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for fleet_id in list(vehicle_list_subscribers.keys()):
+            try:
+                vehicles = await get_fleet_vehicles(fleet_id)
+            except Exception as e:
+                logger.error("Error fetching vehicle list for fleet %s: %s", fleet_id, e)
+                continue
+            subscribers = vehicle_list_subscribers.get(fleet_id, []).copy()
+            for ws in await send_to_all(subscribers, encode_json(vehicles)):
+                remove_vehicle_list_subscriber(fleet_id, ws)
 
 
 # para makita tanan vehicles continuously (bisan newly created) no need to reload
 @ws_router.websocket("/ws/vehicles/all/{fleet_id}")
 async def all_vehicles_ws(websocket: WebSocket, fleet_id: str):
     await websocket.accept()
+    vehicle_list_subscribers.setdefault(fleet_id, []).append(websocket)
     try:
-        while True:
-            vehicles = []
-            # Filter vehicles by fleet_id
-            for vehicle in vehicle_collection.find({"fleet_id": fleet_id}):
-                vehicles.append({
-                    "id": str(vehicle["_id"]),
-                    "location": vehicle.get("location"),  # can be None
-                    "available_seats": vehicle.get("available_seats", 0),
-                    "status": vehicle.get("status", "unavailable"),
-                    "route": vehicle.get("route", ""),
-                    "driverName": vehicle.get("driverName", ""),
-                    "bound_for": vehicle.get("bound_for"),
-                    "plate": vehicle.get("plate", "")
-                })
-
-            # Send updated list of vehicles for this fleet
-            await websocket.send_json(vehicles)
-            await asyncio.sleep(5)  # every 5 sec update
+        # Send the current list immediately, the broadcaster takes over after
+        await send_orjson(websocket, await get_fleet_vehicles(fleet_id))
 
+        await wait_for_disconnect(websocket)
     except WebSocketDisconnect:
-        print(
-            f"Vehicle list WebSocket client for fleet {fleet_id} disconnected")
+        pass
+    finally:
+        remove_vehicle_list_subscriber(fleet_id, websocket)
+    logger.info(
+        "Vehicle list WebSocket client for fleet %s disconnected", fleet_id)
 
 
 @ws_router.websocket("/ws/vehicles/available/{fleet_id}")
@@ -438,16 +877,17 @@ async def available_vehicles_ws(websocket: WebSocket, fleet_id: str):
         fleet_subscribers[fleet_id] = []
     
     fleet_subscribers[fleet_id].append(websocket)
-    logger.info(f"Client connected to fleet {fleet_id}. Total subscribers: {len(fleet_subscribers[fleet_id])}")
+    logger.info("Client connected to fleet %s. Total subscribers: %d",
+                fleet_id, len(fleet_subscribers[fleet_id]))
     
     try:
         # Send initial data immediately
         vehicles = await get_available_vehicles(fleet_id)
-        await websocket.send_json({
+        await send_orjson(websocket, {
             "vehicles": vehicles,
             "timestamp": datetime.utcnow().isoformat()
         })
-        fleet_last_state[fleet_id] = json.dumps(vehicles, sort_keys=True, default=str)
+        fleet_last_state[fleet_id] = orjson.dumps(vehicles, option=orjson.OPT_SORT_KEYS, default=str)
         
         # Poll for changes every 2 seconds
         while True:
@@ -461,22 +901,16 @@ async def available_vehicles_ws(websocket: WebSocket, fleet_id: str):
                 vehicles = await get_available_vehicles(fleet_id)
                 await broadcast_to_fleet(fleet_id, vehicles)
             except Exception as e:
-                logger.error(f"Error fetching vehicles for fleet {fleet_id}: {e}")
+                logger.error("Error fetching vehicles for fleet %s: %s", fleet_id, e)
                 break
     
     except WebSocketDisconnect:
-        logger.info(f"Client disconnected from fleet {fleet_id}")
-        if fleet_id in fleet_subscribers and websocket in fleet_subscribers[fleet_id]:
-            fleet_subscribers[fleet_id].remove(websocket)
-        
-        if fleet_id in fleet_subscribers and not fleet_subscribers[fleet_id]:
-            fleet_subscribers.pop(fleet_id)
-            fleet_last_state.pop(fleet_id, None)
+        logger.info("Client disconnected from fleet %s", fleet_id)
+        remove_fleet_subscriber(fleet_id, websocket)
     
     except Exception as e:
-        logger.error(f"Error in available_vehicles_ws for fleet {fleet_id}: {e}")
-        if fleet_id in fleet_subscribers and websocket in fleet_subscribers[fleet_id]:
-            fleet_subscribers[fleet_id].remove(websocket)
+        logger.error("Error in available_vehicles_ws for fleet %s: %s", fleet_id, e)
+        remove_fleet_subscriber(fleet_id, websocket)
         try:
             await websocket.close()
         except:
@@ -490,31 +924,24 @@ async def vehicle_location_ws(websocket: WebSocket, vehicle_id: str):
 
     try:
         # Add subscriber for this vehicle
-        if vehicle_id not in vehicle_subscribers:
-            vehicle_subscribers[vehicle_id] = []
-        vehicle_subscribers[vehicle_id].append(websocket)
+        vehicle_subscribers.setdefault(vehicle_id, set()).add(websocket)
 
         # Send initial connection confirmation
-        await websocket.send_json({
+        await send_orjson(websocket, {
             "type": "connection_established",
             "vehicle_id": vehicle_id,
             "message": f"Monitoring location updates from vehicle {vehicle_id}",
             "timestamp": datetime.utcnow().isoformat()
         })
 
-        # Keep connection alive
-        while True:
-            await websocket.receive_text()  # Just to keep connection alive
+        await wait_for_disconnect(websocket)
 
     except WebSocketDisconnect:
+        pass
+    finally:
         # Remove subscriber
-        if vehicle_id in vehicle_subscribers:
-            subs = vehicle_subscribers[vehicle_id]
-            if websocket in subs:
-                subs.remove(websocket)
-                if not subs:
-                    vehicle_subscribers.pop(vehicle_id)
-        print(f"Vehicle {vehicle_id} location monitoring client disconnected")
+        remove_vehicle_subscriber(vehicle_id, websocket)
+    logger.info("Vehicle %s location monitoring client disconnected", vehicle_id)
 
 
 # New WebSocket endpoint for all vehicle location monitoring
@@ -528,21 +955,20 @@ async def all_vehicle_locations_ws(websocket: WebSocket):
         all_vehicle_updates_subscribers.append(websocket)
 
         # Send initial connection confirmation
-        await websocket.send_json({
+        await send_orjson(websocket, {
             "type": "connection_established",
             "message": "Monitoring location updates from all vehicles",
             "timestamp": datetime.utcnow().isoformat()
         })
 
-        # Keep connection alive
-        while True:
-            await websocket.receive_text()
+        await wait_for_disconnect(websocket)
 
     except WebSocketDisconnect:
+        pass
+    finally:
         # Remove subscriber
-        if websocket in all_vehicle_updates_subscribers:
-            all_vehicle_updates_subscribers.remove(websocket)
-        print("Global vehicle location monitoring client disconnected")
+        remove_global_subscriber(websocket)
+    logger.info("Global vehicle location monitoring client disconnected")
 
 
 # Function to broadcast vehicle location updates (we'll call this from predict.py)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import Optional, List
 from enum import Enum
@@ -30,7 +30,8 @@ class FleetBase(BaseModel):
     plan_price: Optional[float] = None  # Will be set from subscription plan
     pdf_files: Optional[List[PDFFile]] = None
 
-    @validator('subscription_plan')
+    @field_validator('subscription_plan')
+    @classmethod
     def validate_subscription_plan(cls, v):
         """Validate that subscription_plan is a valid plan code"""
         if v:
@@ -41,7 +42,5 @@ class FleetCreate(FleetBase):
     password: str  # Accept plain password for creation
 
 class FleetPublic(FleetBase):
-    id: str
-
-    class Config:
-        exclude = {"password"}
\ No newline at end of file
+    # No password field here, so it never ends up in a response
+    id: str
\ No newline at end of file
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class LatLon(BaseModel):
+    """Plain latitude/longitude pair shared by the user and vehicle schemas"""
+    latitude: float
+    longitude: float
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -28,9 +28,8 @@ class SubscriptionPlanUpdate(BaseModel):
 
 class SubscriptionPlanPublic(SubscriptionPlanBase):
     """Schema for public subscription plan data"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     created_at: datetime
-    last_updated: datetime
-
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    last_updated: datetime
\ No newline at end of file
@@ -1,37 +1,58 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, computed_field
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+
+# These models aren't on any hot request path, so their validators are
+# built on first use instead of at import time.
+_LAZY = ConfigDict(defer_build=True)
 
 
 class GPSData(BaseModel):
+    model_config = ConfigDict(defer_build=True, populate_by_name=True)
+
     latitude: float
     longitude: float
     altitude: float
-    timestamp: datetime
+    # Epoch milliseconds, the same representation tracking logs are stored
+    # with; still read from "timestamp" so existing payloads keep validating
+    timestamp_ms: int = Field(validation_alias="timestamp")
     fleet_id: str
 
+    @computed_field
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, timezone.utc)
+
 
 class SatelliteData(BaseModel):
+    model_config = _LAZY
+
     Cn0DbHz: float
     SvElevationDegrees: float
     Svid: int
 
 
 class MpuData(BaseModel):
+    model_config = _LAZY
+
     MeasurementX: float
     MeasurementY: float
     MeasurementZ: float
 
 
 class MovedPoint(BaseModel):
+    model_config = _LAZY
+
     latitude: float
     longitude: float
 
 
 class TrackingLogPublic(BaseModel):
+    model_config = _LAZY
+
     id: str
     fleet_id: str
     device_id: str
     gps_data: List[GPSData]
-    SpeedMps: Optional[float]
-    moved_point: Optional[MovedPoint]
+    SpeedMps: Optional[float] = None
+    moved_point: Optional[MovedPoint] = None
@@ -1,15 +1,15 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from enum import Enum
 from typing import Optional
+from app.schemas.geo import LatLon
 
 class UserRole(str, Enum):
     user = "user"
     admin = "admin"
     superadmin = "superadmin"
 
-class Location(BaseModel):
-    latitude: float
-    longitude: float
+# Users carry a bare coordinate pair
+Location = LatLon
 
 class UserBase(BaseModel):
     first_name: str
@@ -34,6 +34,9 @@ class UserLogin(BaseModel):
     password: str
 
 class UserPublic(BaseModel):
+    # Read-only response model: validate straight from documents/objects
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: str
     first_name: str
     last_name: str
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from enum import Enum
 from typing import Optional
+from app.schemas.geo import LatLon
 
 # Enums for vehicle type and status
 
@@ -17,6 +18,13 @@ class VehicleStatus(str, Enum):
     standing = "standing"
 
 
+# Plain string values for comparisons against stored documents, bound once
+# instead of going through the Enum class on every check
+STATUS_AVAILABLE = VehicleStatus.available.value
+STATUS_UNAVAILABLE = VehicleStatus.unavailable.value
+STATUS_FULL = VehicleStatus.full.value
+
+
 class VehicleStatusDetails(str, Enum):
     available = "available"
     unavailable = "unavailable"
@@ -26,9 +34,7 @@ class VehicleStatusDetails(str, Enum):
 # Pydantic model for vehicle location
 
 
-class Location(BaseModel):
-    latitude: float
-    longitude: float
+class Location(LatLon):
     # Unix timestamp (ms) of last location update
     last_updated: Optional[int] = None
 
@@ -54,6 +60,9 @@ class VehicleInDB(VehicleBase):
 
 
 class VehicleTrackResponse(BaseModel):
+    # Read-only response model: validate straight from documents/objects
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: str
     location: Location
     available_seats: int
@@ -10,7 +10,7 @@ sys.path.insert(0, str(project_root))
 # Now import
 try:
     from app.database import user_collection, vehicle_collection, notification_logs_collection
-    from app.utils.notifications import check_and_notify
+    from app.utils.notifications import check_and_notify, LatLng
     from app.utils.haversine import haversine_code
     from bson import ObjectId
     import logging
@@ -65,9 +65,9 @@ async def test_proximity():
         # Fallback mock
         vehicle_location = {"latitude": 10.3157, "longitude": 123.8854}
     
-    # Mock objects for the function (dicts with attr access)
-    user_loc_obj = type("UserLoc", (), user_location)()
-    vehicle_loc_obj = type("VehicleLoc", (), vehicle_location)()
+    # Attribute-access locations for the function (same type the app uses)
+    user_loc_obj = LatLng(user_location["latitude"], user_location["longitude"])
+    vehicle_loc_obj = LatLng(vehicle_location["latitude"], vehicle_location["longitude"])
     
     logger.info(f"🧪 Testing proximity for user {user_id}, vehicle {vehicle_id}")
     
@@ -41,10 +41,13 @@
 #     except JWTError:
 #         return None
 
-from jose import JWTError, jwt
+import jwt
+from jwt import InvalidTokenError as JWTError
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from functools import lru_cache
 import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,22 +61,27 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 1
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
+# Clients present the same access token on every request until it expires,
+# so verified payloads are memoized per token (per worker process)
+ACCESS_TOKEN_CACHE_SIZE = 4096
+
 
 def create_access_token(data: dict):
     """Create a short-lived access token (10 seconds)"""
-    to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, ACCESS_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return jwt.encode(data | {"exp": expire}, ACCESS_KEY, algorithm=ALGORITHM)
 
 
 def create_refresh_token(data: dict):
     """Create a long-lived refresh token (30 days)"""
-    to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, ACCESS_KEY, algorithm=ALGORITHM)
+    return jwt.encode(data | {"exp": expire}, ACCESS_KEY, algorithm=ALGORITHM)
+
+
+@lru_cache(maxsize=ACCESS_TOKEN_CACHE_SIZE)
+def _decode_access_token(token: str) -> dict:
+    """Verify signature and decode; invalid tokens raise, so they are never cached"""
+    return jwt.decode(token, ACCESS_KEY, algorithms=[ALGORITHM])
 
 
 def verify_access_token(token: str) -> dict | None:
@@ -82,19 +90,27 @@ def verify_access_token(token: str) -> dict | None:
     
     PyJWT automatically checks expiration when decoding.
     If expired, jwt.decode() raises ExpiredSignatureError (a JWTError).
+    Cached payloads are re-checked against their exp claim.
     
     Returns:
         dict: Token payload if valid
         None: If token is expired or invalid
     """
     try:
-        payload = jwt.decode(token, ACCESS_KEY, algorithms=[ALGORITHM])
-        logger.debug("Access token verified successfully")
-        return payload
+        payload = _decode_access_token(token)
     except JWTError as e:
         logger.warning(f"Access token verification failed: {str(e)}")
         return None
 
+    # A cached payload may have expired since it was first verified
+    exp = payload.get("exp")
+    if exp is not None and exp <= time.time():
+        logger.warning("Access token verification failed: Signature has expired.")
+        return None
+
+    logger.debug("Access token verified successfully")
+    return dict(payload)  # callers get their own copy of the cached payload
+
 
 def verify_refresh_token(token: str) -> dict | None:
     """
@@ -1,107 +1,192 @@
+import atexit
+import logging
+import os
 import threading
-import time
-from .ml_model import MLModelManager
+from .ml_model import ml_manager
+
+logger = logging.getLogger(__name__)
+
+# Model URL env vars that must be set before loading is attempted
+REQUIRED_ENV_VARS = (
+    "ENHANCED_FEATURES_V6",
+    "ENHANCED_LABEL_ENCODERS_V6",
+    "GRADIENT_BOOSTING_MODEL_V6",
+    # "RANDOM_FOREST_MODEL_V6",  # Commented out - using only gradient boosting
+    "ROBUST_SCALER_V6",
+)
 
 
 class BackgroundModelLoader:
     def __init__(self):
-        self.ml_manager = MLModelManager()
+        # Share the module-level manager rather than building a second one
+        self.ml_manager = ml_manager
         self.loading_thread = None
         self.is_loading = False
         self.load_error = None
         self.load_complete = False
+        # Set once loading has finished, successfully or not
+        self._done = threading.Event()
+        # Guards is_loading / load_complete / load_error transitions
+        self._lock = threading.Lock()
+        # Set on shutdown so a pending load bails out before the heavy work
+        self._cancel_event = threading.Event()
+        # Rebuilt on each state transition so get_status doesn't allocate
+        self._status = {"status": "not_started", "models_loaded": False}
 
     def start_background_loading(self):
         """Start loading models in the background with delay for Railway"""
-        if self.is_loading or self.load_complete:
-            return
+        with self._lock:
+            if self.is_loading or self.load_complete:
+                return
+            self._apply_state(True, False, self.load_error)
+            self._done.clear()
+            self._cancel_event.clear()
 
-        print("🚀 Starting background model loading...")
-        self.is_loading = True
+        logger.info("🚀 Starting background model loading...")
         self.loading_thread = threading.Thread(
             target=self._load_models_background)
         self.loading_thread.daemon = True
         self.loading_thread.start()
 
+    def begin_reload(self):
+        """Mark a manual reload as started; returns False if a load is already running"""
+        with self._lock:
+            if self.is_loading:
+                return False
+            self._apply_state(True, False, None)
+            self._done.clear()
+        return True
+
+    def finish_reload(self, error=None):
+        """Publish the outcome of a manual reload and wake wait_for_models"""
+        self._set_state(False, error is None, error)
+        self._done.set()
+
+    def load_all_models(self):
+        """Load every model in the calling thread (manual reloads, between begin_reload and finish_reload)"""
+        self.ml_manager._load_all()
+
+    def reset(self):
+        """Forget any previous outcome so loading can be started again"""
+        self._set_state(False, False, None)
+
+    def _set_state(self, is_loading, load_complete, load_error):
+        """Publish a loading state transition atomically"""
+        with self._lock:
+            self._apply_state(is_loading, load_complete, load_error)
+
+    def _apply_state(self, is_loading, load_complete, load_error):
+        """Set the state flags and rebuild the status dict (caller holds _lock)"""
+        self.is_loading = is_loading
+        self.load_complete = load_complete
+        self.load_error = load_error
+
+        # Prioritize successful completion over previous errors
+        if load_complete:
+            self._status = {"status": "ready", "models_loaded": True}
+        elif is_loading:
+            self._status = {"status": "loading", "models_loaded": False,
+                            "message": "Models are being downloaded and loaded in background"}
+        elif load_error:
+            self._status = {"status": "error",
+                            "models_loaded": False, "error": load_error}
+        else:
+            self._status = {"status": "not_started", "models_loaded": False}
+
     def _load_models_background(self):
         """Load models immediately on server startup"""
+        try:
+            self._load_models()
+        finally:
+            # Wake anyone in wait_for_models whatever the outcome
+            self._done.set()
+
+    def _load_models(self):
         try:
             # Load models immediately - no delay needed
-            print("📦 Background: Starting immediate model loading...")
-            print("📦 Background: Checking for model requirements...")
+            logger.info("📦 Background: Starting immediate model loading...")
+            logger.debug("📦 Background: Checking for model requirements...")
 
             # Check if environment variables are available
-            import os
-            required_env_vars = [
-                "ENHANCED_FEATURES_V6",
-                "ENHANCED_LABEL_ENCODERS_V6",
-                "GRADIENT_BOOSTING_MODEL_V6",
-                # "RANDOM_FOREST_MODEL_V6",  # Commented out - using only gradient boosting
-                "ROBUST_SCALER_V6"
-            ]
-
-            missing_vars = [
-                var for var in required_env_vars if not os.getenv(var)]
+            env = os.environ
+            missing_vars = [var for var in REQUIRED_ENV_VARS if not env.get(var)]
             if missing_vars:
                 error_msg = f"Model URLs not configured. Missing: {missing_vars}. Models will be disabled."
-                print(f"⚠️ {error_msg}")
-                self.load_error = error_msg
-                self.is_loading = False
+                logger.warning("⚠️ %s", error_msg)
+                self._set_state(False, False, error_msg)
                 return
 
-            print("📦 Background: Environment variables found")
-            print("🚀 Attempting memory-optimized model loading...")
+            logger.debug("📦 Background: Environment variables found")
+
+            if self._cancel_event.is_set():
+                logger.info("🛑 Background: Model loading cancelled")
+                self._set_state(False, False, "Model loading cancelled")
+                return
+
+            logger.info("🚀 Attempting memory-optimized model loading...")
 
             try:
                 # Try to load models with memory optimization
                 self.ml_manager._load_all_optimized()
-                self.load_complete = True
-                self.is_loading = False
-                self.load_error = None
-                print("✅ Memory-optimized model loading completed!")
+                self._set_state(False, True, None)
+                logger.info("✅ Memory-optimized model loading completed!")
             except Exception as e:
-                print(f"❌ Memory-optimized loading failed: {e}")
-                print("📋 Use /admin/reload-models endpoint to try again")
-                self.load_error = f"Auto-loading failed: {str(e)}. Use manual reload."
-                self.is_loading = False
+                logger.error("❌ Memory-optimized loading failed: %s", e)
+                logger.info("📋 Use /admin/reload-models endpoint to try again")
+                self._set_state(
+                    False, False, f"Auto-loading failed: {str(e)}. Use manual reload.")
 
         except Exception as e:
             error_msg = f"Model initialization failed (app will continue): {str(e)}"
-            print(f"⚠️ {error_msg}")
-            self.load_error = error_msg
-            self.is_loading = False
+            logger.warning("⚠️ %s", error_msg)
+            self._set_state(False, False, error_msg)
+
+    def cancel(self):
+        """Ask a pending background load to stop before it starts loading"""
+        self._cancel_event.set()
+
+    def shutdown(self, timeout=5):
+        """Cancel any pending load and give the worker a moment to finish"""
+        self.cancel()
+        thread = self.loading_thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
 
     def get_status(self):
-        """Get current loading status"""
-        # Prioritize successful completion over previous errors
-        if self.load_complete:
-            return {"status": "ready", "models_loaded": True}
-        elif self.is_loading:
-            return {"status": "loading", "models_loaded": False, "message": "Models are being downloaded and loaded in background"}
-        elif self.load_error:
-            return {"status": "error", "models_loaded": False, "error": self.load_error}
-        else:
-            return {"status": "not_started", "models_loaded": False}
+        """Get current loading status (shared dict, treat as read-only)"""
+        return self._status
+
+    def _snapshot(self):
+        """Read (is_loading, load_complete, load_error) as one consistent state"""
+        with self._lock:
+            return self.is_loading, self.load_complete, self.load_error
 
     def wait_for_models(self, timeout=300):  # 5 minute timeout
         """Wait for models to be ready with timeout"""
-        start_time = time.time()
-        while not self.load_complete and not self.load_error:
-            if time.time() - start_time > timeout:
+        is_loading, load_complete, load_error = self._snapshot()
+        if not load_complete and not load_error:
+            if not is_loading:
+                raise Exception("Model loading has not been started")
+            if not self._done.wait(timeout):
                 raise TimeoutError("Model loading timed out")
-            time.sleep(1)
+            is_loading, load_complete, load_error = self._snapshot()
 
-        if self.load_error:
-            raise Exception(f"Model loading failed: {self.load_error}")
-
-        return self.ml_manager
+        if load_complete:
+            return self.ml_manager
+        if load_error:
+            raise Exception(f"Model loading failed: {load_error}")
+        # Reset or restarted while we were waiting
+        raise Exception("Models are not loaded")
 
     def get_ml_manager(self):
         """Get the ML manager (only if ready)"""
-        if self.load_complete:
+        _, load_complete, _ = self._snapshot()
+        if load_complete:
             return self.ml_manager
         return None
 
 
 # Global instance
 background_loader = BackgroundModelLoader()
+# Fallback for exits that skip the FastAPI shutdown hook
+atexit.register(background_loader.shutdown)
@@ -1,127 +1,211 @@
+import asyncio
+import gzip
+import hmac
+import logging
 import os
+import re
 import secrets
 import time
-import requests
-from typing import Dict, Optional
-
-# In-memory store for OTPs
-otp_store: Dict[str, dict] = {}
-
-class EmailSender:
-    def __init__(self):
-        self.brevo_api_key = os.getenv("BREVO_API_KEY")
-        self.brevo_from_email = os.getenv("BREVO_FROM_EMAIL", "noreply@ridealert.com")
-        
-        print(f"🔧 Brevo Config Loaded:")
-        print(f"   From Email: {self.brevo_from_email}")
-        print(f"   API Key: {'*' * len(self.brevo_api_key) if self.brevo_api_key else 'NOT SET'}")
-        
-    def generate_otp(self) -> str:
-        """Generate a 6-digit OTP"""
-        return str(secrets.randbelow(900000) + 100000)
-    
-    def store_otp(self, email: str, otp: str, expires_in: int = 600):
-        """Store OTP with expiration (default 10 minutes)"""
-        otp_store[email] = {
-            "otp": otp,
-            "expires_at": time.time() + expires_in
-        }
-    
-    def verify_otp(self, email: str, otp: str) -> bool:
-        """Verify OTP and clean up if valid"""
-        if email not in otp_store:
-            return False
-        
-        stored_data = otp_store[email]
-        
-        if time.time() > stored_data["expires_at"]:
-            del otp_store[email]
-            return False
-        
-        if stored_data["otp"] == otp:
-            del otp_store[email]
-            return True
-        
-        return False
-
-    def _create_email_payload(self, to_email: str, to_name: str, subject: str, html_content: str, text_content: str, tags: list, headers: dict = None) -> dict:
-        """Create optimized email payload with anti-spam measures"""
-        base_payload = {
-            "sender": {
-                "name": "RideAlert",
-                "email": self.brevo_from_email
-            },
-            "to": [
-                {
-                    "email": to_email,
-                    "name": to_name
-                }
-            ],
-            "subject": subject,
-            "htmlContent": html_content,
-            "textContent": text_content,
-            "tags": tags,
-            "headers": {
-                "X-Mailer": "RideAlert-System",
-                "X-Priority": "3",  # Normal priority
-                "X-MSMail-Priority": "Normal",
-                "Importance": "Normal"
-            },
-            "params": {
-                "company": "RideAlert",
-                "website": "https://ridealertadminpanel.onrender.com"
-            }
-        }
-        
-        # Add custom headers if provided
-        if headers:
-            base_payload["headers"].update(headers)
-            
-        return base_payload
-
-    def send_verification_email(self, email: str, otp: str) -> bool:
+import httpx
+import orjson
+from collections import OrderedDict
+from functools import lru_cache
+from string import Template
+from typing import Dict, Optional, Tuple
+from .rate_limiter import company_email_limiter, verification_send_limiter
+
+logger = logging.getLogger(__name__)
+
+# In-memory store for OTPs in store order. Every OTP gets the same TTL, so
+# store order is also expiry order: the cap evicts the stalest entries and
+# the sweeper only has to look at the front
+# Entries are compact (otp, expires_at) tuples rather than per-entry dicts
+otp_store: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+OTP_TTL = 600  # seconds (10 minutes)
+OTP_MAX_ENTRIES = int(os.getenv("OTP_MAX_ENTRIES", "100000"))
+OTP_SWEEP_INTERVAL = 60  # seconds between expired-OTP sweeps
+
+# Verification sends currently talking to Brevo: email -> (otp, result future)
+_inflight_verifications: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+
+def purge_expired_otps() -> int:
+    """Drop OTPs that expired without ever being verified (oldest first)"""
+    now = time.monotonic()
+    removed = 0
+    while otp_store:
+        _, expires_at = next(iter(otp_store.values()))
+        if expires_at >= now:
+            break
+        otp_store.popitem(last=False)
+        removed += 1
+    return removed
+
+
+async def otp_sweeper(interval: int = OTP_SWEEP_INTERVAL):
+    """Background task so abandoned OTPs don't accumulate in memory"""
+    while True:
+        await asyncio.sleep(interval)
+        removed = purge_expired_otps()
+        if removed:
+            logger.info("🧹 Purged %s expired OTPs", removed)
+
+
+# Shared Brevo client; keeps connections alive across sends
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Lazily create the shared async HTTP client"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=50,
+                                max_keepalive_connections=20)
+        )
+    return _client
+
+
+BREVO_API_URL = "https://api.brevo.com/v3/smtp/email"
+
+# Brevo enforces per-second send limits; cap concurrency and meter requests
+# with a token bucket (sustained BREVO_RPS, short bursts up to BREVO_BURST)
+BREVO_CONCURRENCY = int(os.getenv("BREVO_CONCURRENCY", "8"))
+BREVO_RPS = float(os.getenv("BREVO_RPS", "10"))
+BREVO_BURST = max(1, int(os.getenv("BREVO_BURST", "5")))
+
+# Transient Brevo responses worth retrying with backoff
+BREVO_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+BREVO_MAX_ATTEMPTS = 3
+BREVO_MAX_BACKOFF = 30
+
+# Opt-in gzip request bodies (HTML compresses ~3-4x); falls back to plain
+# JSON if Brevo answers 415 Unsupported Media Type
+BREVO_GZIP = os.getenv("BREVO_GZIP", "").lower() == "true"
+
+
+class _TokenBucket:
+    """Async token bucket: refills at `rate` tokens/s up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        # The bookkeeping has no await, so it is atomic on the event loop.
+        # A caller that finds the bucket empty still takes its token, leaving
+        # it negative, and sleeps off its share of the debt outside any lock;
+        # later callers see the deeper debt and queue up behind it
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+_brevo_semaphore = asyncio.Semaphore(BREVO_CONCURRENCY)
+_brevo_bucket = _TokenBucket(BREVO_RPS, BREVO_BURST)
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """Exponential backoff, overridden by a numeric Retry-After header"""
+    delay = 2 ** attempt
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
         try:
-            print(f"📧 Attempting to send verification email to: {email}")
-            
-            if not self.brevo_api_key:
-                error_msg = "Brevo configuration incomplete - check BREVO_API_KEY"
-                print(f"❌ {error_msg}")
-                raise ValueError(error_msg)
-            
-            url = "https://api.brevo.com/v3/smtp/email"
-            headers = {
-                "accept": "application/json",
-                "api-key": self.brevo_api_key,
-                "content-type": "application/json"
-            }
-            
-            # Improved email content with anti-spam optimization
-            subject = "Verify Your RideAlert Account"
-            html_content = self._create_verification_html(otp)
-            text_content = self._create_verification_text(otp)
-            
-            payload = self._create_email_payload(
-                to_email=email,
-                to_name=email.split('@')[0],
-                subject=subject,
-                html_content=html_content,
-                text_content=text_content,
-                tags=["verification", "authentication", "transactional"],
-                headers={
-                    "X-Template": "account-verification"
-                }
-            )
-            
-            return self._send_email_via_brevo(url, headers, payload, email, "verification")
-                
-        except Exception as e:
-            print(f"❌ Unexpected error in verification email: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-
-    def _create_verification_html(self, otp: str) -> str:
-        return f"""
+            delay = float(retry_after)
+        except ValueError:
+            pass
+    return max(0.0, min(BREVO_MAX_BACKOFF, delay))
+
+
+async def _post_to_brevo(headers: dict, payload: dict) -> httpx.Response:
+    """
+    POST to Brevo, retrying rate-limit/server errors and transport failures
+    (timeouts, dropped connections) with backoff. The last transport error
+    is re-raised.
+    """
+    # Encode once with orjson; retries resend the same bytes
+    body = orjson.dumps(payload)
+    send_headers, send_body = headers, body
+    if BREVO_GZIP:
+        send_headers = {**headers, "Content-Encoding": "gzip"}
+        send_body = gzip.compress(body, compresslevel=6)
+
+    for attempt in range(BREVO_MAX_ATTEMPTS):
+        last_attempt = attempt == BREVO_MAX_ATTEMPTS - 1
+        try:
+            response = await _post_once(send_headers, send_body)
+            if response.status_code == 415 and send_body is not body:
+                # Compressed bodies rejected; resend as plain JSON
+                send_headers, send_body = headers, body
+                response = await _post_once(send_headers, send_body)
+        except httpx.TransportError as e:
+            if last_attempt:
+                raise
+            delay = _retry_delay(None, attempt)
+            logger.warning("⏳ Brevo request failed (%s), retrying in %.0fs (%s/%s)",
+                           e, delay, attempt + 1, BREVO_MAX_ATTEMPTS)
+            await asyncio.sleep(delay)
+            continue
+        if response.status_code not in BREVO_RETRY_STATUSES or last_attempt:
+            return response
+
+        delay = _retry_delay(response, attempt)
+        logger.warning("⏳ Brevo returned %s, retrying in %.0fs (%s/%s)",
+                       response.status_code, delay, attempt + 1, BREVO_MAX_ATTEMPTS)
+        await asyncio.sleep(delay)
+
+
+async def _post_once(headers: dict, body: bytes) -> httpx.Response:
+    """Single POST through the shared client, concurrency cap and rate limit"""
+    async with _brevo_semaphore:
+        await _brevo_bucket.acquire()
+        return await _get_client().post(BREVO_API_URL, headers=headers, content=body)
+
+
+async def close_email_client():
+    """Close the shared HTTP client (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+# Anti-spam headers and params shared by every Brevo payload; treat as read-only
+EMAIL_HEADERS = {
+    "X-Mailer": "RideAlert-System",
+    "X-Priority": "3",  # Normal priority
+    "X-MSMail-Priority": "Normal",
+    "Importance": "Normal"
+}
+EMAIL_PARAMS = {
+    "company": "RideAlert",
+    "website": "https://ridealertadminpanel.onrender.com"
+}
+_APPROVAL_EMAIL_HEADERS = {**EMAIL_HEADERS, "X-Template": "account-approval"}
+_REJECTION_EMAIL_HEADERS = {**EMAIL_HEADERS, "X-Template": "account-rejection"}
+
+
+
+def _minify_html(html: str) -> str:
+    """
+    Drop the source indentation from an HTML template: whitespace runs that
+    span a line break between tags disappear, other runs collapse to one
+    space (same rendering, including inside <style>)
+    """
+    html = re.sub(r">\s*\n\s*<", "><", html)
+    return re.sub(r"\s+", " ", html).strip()
+
+
+# Email bodies are compiled once; only the $-placeholders change per send
+_VERIFICATION_HTML_TMPL = Template(_minify_html("""
         <!DOCTYPE html>
         <html>
         <head>
@@ -129,7 +213,7 @@ class EmailSender:
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <title>Verify Your RideAlert Account</title>
             <style>
-                body {{ 
+                body { 
                     font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
                     line-height: 1.6; 
                     color: #333333; 
@@ -137,30 +221,30 @@ class EmailSender:
                     padding: 0;
                     background-color: #f8f9fa;
                     -webkit-font-smoothing: antialiased;
-                }}
-                .container {{ 
+                }
+                .container { 
                     max-width: 600px; 
                     margin: 0 auto; 
                     background: #ffffff;
                     border-radius: 12px;
                     overflow: hidden;
                     box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-                }}
-                .header {{ 
+                }
+                .header { 
                     background: linear-gradient(135deg, #2563eb, #1d4ed8); 
                     color: white; 
                     padding: 40px 30px; 
                     text-align: center; 
-                }}
-                .content {{ 
+                }
+                .content { 
                     padding: 40px 30px; 
                     background: #ffffff;
-                }}
-                .otp-container {{
+                }
+                .otp-container {
                     text-align: center;
                     margin: 30px 0;
-                }}
-                .otp {{ 
+                }
+                .otp { 
                     font-size: 48px; 
                     font-weight: 800; 
                     color: #2563eb; 
@@ -171,15 +255,15 @@ class EmailSender:
                     border: 3px solid #e2e8f0;
                     display: inline-block;
                     font-family: 'Courier New', monospace;
-                }}
-                .footer {{ 
+                }
+                .footer { 
                     text-align: center; 
                     padding: 30px; 
                     color: #64748b; 
                     font-size: 13px;
                     background: #f8f9fa;
                     border-top: 1px solid #e2e8f0;
-                }}
+                }
             </style>
         </head>
         <body>
@@ -196,7 +280,7 @@ class EmailSender:
                     <p>You're just one step away from accessing your RideAlert account. We received a request to verify this email address for your account.</p>
                     
                     <div class="otp-container">
-                        <div class="otp">{otp}</div>
+                        <div class="otp">$otp</div>
                     </div>
                     
                     <div style="background: #fff7ed; border-left: 4px solid #f97316; padding: 20px; margin: 25px 0; border-radius: 8px;">
@@ -222,16 +306,15 @@ class EmailSender:
             </div>
         </body>
         </html>
-        """
+        """))
 
-    def _create_verification_text(self, otp: str) -> str:
-        return f"""RIDEALERT ACCOUNT VERIFICATION
+_VERIFICATION_TEXT_TMPL = Template("""RIDEALERT ACCOUNT VERIFICATION
 
 Hello,
 
 To complete your RideAlert account setup, please use the verification code below:
 
-VERIFICATION CODE: {otp}
+VERIFICATION CODE: $otp
 
 This code expires in 10 minutes for security reasons.
 
@@ -241,112 +324,14 @@ Need help? Contact our support team.
 
 © 2025 RideAlert. All rights reserved.
 https://ridealertadminpanel.onrender.com
-"""
-
-    def _send_email_via_brevo(self, url: str, headers: dict, payload: dict, recipient: str, email_type: str) -> bool:
-        """Send email via Brevo API with enhanced error handling"""
-        try:
-            print(f"🔗 Sending {email_type} email via Brevo API...")
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            
-            print(f"📨 Brevo API Response for {email_type}:")
-            print(f"   Status Code: {response.status_code}")
-            
-            if response.status_code == 201:
-                response_data = response.json()
-                message_id = response_data.get('messageId', 'Unknown')
-                print(f"✅ {email_type.capitalize()} email accepted by Brevo! Message ID: {message_id}")
-                return True
-            else:
-                error_details = response.text
-                print(f"❌ Brevo API Error for {email_type}: {response.status_code}")
-                print(f"   Error Details: {error_details}")
-                return False
-                
-        except requests.exceptions.Timeout:
-            print(f"❌ Brevo API timeout for {email_type} email to {recipient}")
-            return False
-        except Exception as e:
-            print(f"❌ Unexpected error sending {email_type} email: {e}")
-            return False
-
+""")
 
-class ApprovalEmailSender:
-    def __init__(self):
-        self.brevo_api_key = os.getenv("BREVO_API_KEY")
-        self.brevo_from_email = os.getenv("BREVO_FROM_EMAIL", "noreply@ridealert.com")
-    
-    def send_approval_email(self, company_email: str, company_name: str, login_credentials: dict = None) -> bool:
-        """
-        Send approval email to company with login credentials
-        """
-        try:
-            print(f"📧 Sending approval email to: {company_email}")
-            
-            if not self.brevo_api_key:
-                error_msg = "Brevo configuration incomplete - check BREVO_API_KEY"
-                print(f"❌ {error_msg}")
-                return False
-            
-            url = "https://api.brevo.com/v3/smtp/email"
-            headers = {
-                "accept": "application/json",
-                "api-key": self.brevo_api_key,
-                "content-type": "application/json"
-            }
-            
-            subject = f"Registration Approved - Welcome to RideAlert, {company_name}!"
-            html_content = self._create_approval_html(company_name, company_email, login_credentials)
-            text_content = self._create_approval_text(company_name, company_email, login_credentials)
-            
-            payload = {
-                "sender": {
-                    "name": "RideAlert Fleet Management",
-                    "email": self.brevo_from_email
-                },
-                "to": [
-                    {
-                        "email": company_email,
-                        "name": company_name
-                    }
-                ],
-                "subject": subject,
-                "htmlContent": html_content,
-                "textContent": text_content,
-                "headers": {
-                    "X-Mailer": "RideAlert-System",
-                    "X-Priority": "3",
-                    "X-MSMail-Priority": "Normal",
-                    "Importance": "Normal",
-                    "X-Template": "account-approval"
-                },
-                "tags": ["approval", "onboarding", "transactional"],
-                "params": {
-                    "company": "RideAlert",
-                    "website": "https://ridealertadminpanel.onrender.com"
-                }
-            }
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            
-            print(f"📨 Approval Email API Response: {response.status_code}")
-            
-            if response.status_code == 201:
-                print(f"✅ Approval email sent successfully to {company_email}")
-                return True
-            else:
-                print(f"❌ Failed to send approval email: {response.text}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Error sending approval email: {e}")
-            return False
+# Only the OTP varies in verification emails, so skip templating entirely
+# and join precomputed halves around it
+_VERIFICATION_HTML_PREFIX, _VERIFICATION_HTML_SUFFIX = _VERIFICATION_HTML_TMPL.template.split("$otp")
+_VERIFICATION_TEXT_PREFIX, _VERIFICATION_TEXT_SUFFIX = _VERIFICATION_TEXT_TMPL.template.split("$otp")
 
-    def _create_approval_html(self, company_name: str, company_email: str, login_credentials: dict) -> str:
-        login_url = login_credentials.get('login_url', 'https://ridealertadminpanel.onrender.com') if login_credentials else 'https://ridealertadminpanel.onrender.com'
-        
-        return f"""
+_APPROVAL_HTML_TMPL = Template(_minify_html("""
         <!DOCTYPE html>
         <html>
         <head>
@@ -354,47 +339,47 @@ class ApprovalEmailSender:
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <title>Registration Approved - RideAlert</title>
             <style>
-                body {{ 
+                body { 
                     font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
                     line-height: 1.6; 
                     color: #333333; 
                     margin: 0;
                     padding: 0;
                     background-color: #f8f9fa;
-                }}
-                .container {{ 
+                }
+                .container { 
                     max-width: 600px; 
                     margin: 0 auto; 
                     background: #ffffff;
                     border-radius: 12px;
                     overflow: hidden;
                     box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-                }}
-                .header {{ 
+                }
+                .header { 
                     background: linear-gradient(135deg, #10b981, #059669); 
                     color: white; 
                     padding: 40px 30px; 
                     text-align: center; 
-                }}
-                .content {{ 
+                }
+                .content { 
                     padding: 40px 30px; 
                     background: #ffffff;
-                }}
-                .credentials {{
+                }
+                .credentials {
                     background: #f0fdf4;
                     border: 2px solid #bbf7d0;
                     border-radius: 8px;
                     padding: 20px;
                     margin: 20px 0;
-                }}
-                .footer {{ 
+                }
+                .footer { 
                     text-align: center; 
                     padding: 30px; 
                     color: #64748b; 
                     font-size: 13px;
                     background: #f8f9fa;
                     border-top: 1px solid #e2e8f0;
-                }}
+                }
             </style>
         </head>
         <body>
@@ -404,7 +389,7 @@ class ApprovalEmailSender:
                     <p>Welcome to RideAlert Fleet Management</p>
                 </div>
                 <div class="content">
-                    <h2>Congratulations, {company_name}!</h2>
+                    <h2>Congratulations, $company_name!</h2>
                     
                     <p>Your company registration has been <strong>approved</strong> and your fleet management account is now active.</p>
                     
@@ -412,9 +397,9 @@ class ApprovalEmailSender:
                     
                     <div class="credentials">
                         <h3>Login Credentials:</h3>
-                        <p><strong>Email:</strong> {company_email}</p>
+                        <p><strong>Email:</strong> $company_email</p>
                         <p><strong>Password:</strong> Use the password you created during registration</p>
-                        <p><strong>Login URL:</strong> <a href="{login_url}">Access Your Dashboard</a></p>
+                        <p><strong>Login URL:</strong> <a href="$login_url">Access Your Dashboard</a></p>
                     </div>
                     
                     <p><strong>Next Steps:</strong></p>
@@ -441,23 +426,20 @@ class ApprovalEmailSender:
             </div>
         </body>
         </html>
-        """
+        """))
 
-    def _create_approval_text(self, company_name: str, company_email: str, login_credentials: dict) -> str:
-        login_url = login_credentials.get('login_url', 'https://ridealertadminpanel.onrender.com') if login_credentials else 'https://ridealertadminpanel.onrender.com'
-        
-        return f"""REGISTRATION APPROVED - RIDEALERT
+_APPROVAL_TEXT_TMPL = Template("""REGISTRATION APPROVED - RIDEALERT
 
-Congratulations, {company_name}!
+Congratulations, $company_name!
 
 Your company registration has been approved and your fleet management account is now active.
 
 You can now access the RideAlert dashboard to manage your vehicles and track routes.
 
 Login Details:
-• Email: {company_email}
+• Email: $company_email
 • Password: Use the password you created during registration
-• Login URL: {login_url}
+• Login URL: $login_url
 
 Next Steps:
 • Log in to your dashboard
@@ -469,82 +451,9 @@ Need help? Contact our support team.
 
 © 2025 RideAlert. All rights reserved.
 Website: https://ridealertadminpanel.onrender.com
-"""
-
+""")
 
-class RejectionEmailSender:
-    def __init__(self):
-        self.brevo_api_key = os.getenv("BREVO_API_KEY")
-        self.brevo_from_email = os.getenv("BREVO_FROM_EMAIL", "noreply@ridealert.com")
-    
-    def send_rejection_email(self, company_email: str, company_name: str, rejection_reason: str = None) -> bool:
-        """
-        Send rejection email to company with optional reason
-        """
-        try:
-            print(f"📧 Sending rejection email to: {company_email}")
-            
-            if not self.brevo_api_key:
-                error_msg = "Brevo configuration incomplete - check BREVO_API_KEY"
-                print(f"❌ {error_msg}")
-                return False
-            
-            url = "https://api.brevo.com/v3/smtp/email"
-            headers = {
-                "accept": "application/json",
-                "api-key": self.brevo_api_key,
-                "content-type": "application/json"
-            }
-            
-            subject = f"Update on Your RideAlert Registration - {company_name}"
-            html_content = self._create_rejection_html(company_name, rejection_reason)
-            text_content = self._create_rejection_text(company_name, rejection_reason)
-            
-            payload = {
-                "sender": {
-                    "name": "RideAlert Fleet Management",
-                    "email": self.brevo_from_email
-                },
-                "to": [
-                    {
-                        "email": company_email,
-                        "name": company_name
-                    }
-                ],
-                "subject": subject,
-                "htmlContent": html_content,
-                "textContent": text_content,
-                "headers": {
-                    "X-Mailer": "RideAlert-System",
-                    "X-Priority": "3",
-                    "X-MSMail-Priority": "Normal",
-                    "Importance": "Normal",
-                    "X-Template": "account-rejection"
-                },
-                "tags": ["rejection", "registration", "transactional"],
-                "params": {
-                    "company": "RideAlert",
-                    "website": "https://ridealertadminpanel.onrender.com"
-                }
-            }
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            
-            print(f"📨 Rejection Email API Response: {response.status_code}")
-            
-            if response.status_code == 201:
-                print(f"✅ Rejection email sent successfully to {company_email}")
-                return True
-            else:
-                print(f"❌ Failed to send rejection email: {response.text}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Error sending rejection email: {e}")
-            return False
-
-    def _create_rejection_html(self, company_name: str, rejection_reason: str) -> str:
-        return f"""
+_REJECTION_HTML_TMPL = Template(_minify_html("""
         <!DOCTYPE html>
         <html>
         <head>
@@ -552,54 +461,54 @@ class RejectionEmailSender:
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <title>Registration Update - RideAlert</title>
             <style>
-                body {{ 
+                body { 
                     font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
                     line-height: 1.6; 
                     color: #333333; 
                     margin: 0;
                     padding: 0;
                     background-color: #f8f9fa;
-                }}
-                .container {{ 
+                }
+                .container { 
                     max-width: 600px; 
                     margin: 0 auto; 
                     background: #ffffff;
                     border-radius: 12px;
                     overflow: hidden;
                     box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-                }}
-                .header {{ 
+                }
+                .header { 
                     background: linear-gradient(135deg, #6b7280, #4b5563); 
                     color: white; 
                     padding: 40px 30px; 
                     text-align: center; 
-                }}
-                .content {{ 
+                }
+                .content { 
                     padding: 40px 30px; 
                     background: #ffffff;
-                }}
-                .notice {{
+                }
+                .notice {
                     background: #fef2f2;
                     border: 2px solid #fecaca;
                     border-radius: 8px;
                     padding: 20px;
                     margin: 20px 0;
-                }}
-                .next-steps {{
+                }
+                .next-steps {
                     background: #fffbeb;
                     border: 2px solid #fed7aa;
                     border-radius: 8px;
                     padding: 20px;
                     margin: 20px 0;
-                }}
-                .footer {{ 
+                }
+                .footer { 
                     text-align: center; 
                     padding: 30px; 
                     color: #64748b; 
                     font-size: 13px;
                     background: #f8f9fa;
                     border-top: 1px solid #e2e8f0;
-                }}
+                }
             </style>
         </head>
         <body>
@@ -609,15 +518,13 @@ class RejectionEmailSender:
                     <p>RideAlert Fleet Management</p>
                 </div>
                 <div class="content">
-                    <h2>Dear {company_name},</h2>
+                    <h2>Dear $company_name,</h2>
                     
                     <p>Thank you for your interest in RideAlert. After careful review, we regret to inform you that your registration request has not been approved at this time.</p>
                     
                     <div class="notice">
                         <h3>Application Status: <span style="color: #dc2626;">Not Approved</span></h3>
-                        {f'<p><strong>Reason:</strong> {rejection_reason}</p>' if rejection_reason else '''
-                        <p>This decision may be due to various factors including business verification requirements, documentation completeness, or current capacity limitations.</p>
-                        '''}
+                        $reason_block
                     </div>
                     
                     <div class="next-steps">
@@ -648,17 +555,16 @@ class RejectionEmailSender:
             </div>
         </body>
         </html>
-        """
+        """))
 
-    def _create_rejection_text(self, company_name: str, rejection_reason: str) -> str:
-        return f"""REGISTRATION UPDATE - RIDEALERT
+_REJECTION_TEXT_TMPL = Template("""REGISTRATION UPDATE - RIDEALERT
 
-Dear {company_name},
+Dear $company_name,
 
 Thank you for your interest in RideAlert. After careful review, we regret to inform you that your registration request has not been approved at this time.
 
 Application Status: Not Approved
-{ f'Reason: {rejection_reason}' if rejection_reason else 'This decision may be due to various factors including business verification requirements, documentation completeness, or current capacity limitations.'}
+$reason_line
 
 What You Can Do Next:
 • Review your submitted information for accuracy
@@ -672,7 +578,394 @@ Thank you for considering RideAlert for your fleet management needs.
 
 © 2025 RideAlert. All rights reserved.
 Website: https://ridealertadminpanel.onrender.com
-"""
+""")
+
+# Images must be hotlinked, never inlined as base64: every byte of the body
+# is uploaded to Brevo and sent to each recipient
+for _tmpl in (_VERIFICATION_HTML_TMPL, _APPROVAL_HTML_TMPL, _REJECTION_HTML_TMPL):
+    if "data:image" in _tmpl.template:
+        raise ValueError(
+            "Inline data:image assets in email templates; link them instead")
+
+# Rejection emails without an explicit reason get this explanation
+_REJECTION_DEFAULT_REASON = "This decision may be due to various factors including business verification requirements, documentation completeness, or current capacity limitations."
+_REJECTION_DEFAULT_HTML = f"<p>{_REJECTION_DEFAULT_REASON}</p>"
+
+# Bulk approvals/rejections often repeat the same company and reason
+EMAIL_RENDER_CACHE_SIZE = int(os.getenv("EMAIL_RENDER_CACHE_SIZE", "256"))
+
+
+@lru_cache(maxsize=EMAIL_RENDER_CACHE_SIZE)
+def _render_approval(company_name: str, company_email: str, login_url: str) -> tuple:
+    """(html, text) bodies for an approval email"""
+    fields = {"company_name": company_name,
+              "company_email": company_email, "login_url": login_url}
+    return _APPROVAL_HTML_TMPL.substitute(fields), _APPROVAL_TEXT_TMPL.substitute(fields)
+
+
+@lru_cache(maxsize=EMAIL_RENDER_CACHE_SIZE)
+def _render_rejection(company_name: str, rejection_reason: Optional[str]) -> tuple:
+    """(html, text) bodies for a rejection email"""
+    reason_block = f'<p><strong>Reason:</strong> {rejection_reason}</p>' if rejection_reason else _REJECTION_DEFAULT_HTML
+    reason_line = f'Reason: {rejection_reason}' if rejection_reason else _REJECTION_DEFAULT_REASON
+    return (
+        _REJECTION_HTML_TMPL.substitute(
+            company_name=company_name, reason_block=reason_block),
+        _REJECTION_TEXT_TMPL.substitute(
+            company_name=company_name, reason_line=reason_line)
+    )
+
+
+async def post_brevo_email(headers: dict, payload: dict, recipient: str, email_type: str) -> bool:
+    """Send a Brevo payload and report whether it was accepted (shared by all senders)"""
+    try:
+        logger.debug("🔗 Sending %s email via Brevo API...", email_type)
+        
+        response = await _post_to_brevo(headers, payload)
+        
+        logger.debug("📨 Brevo API Response for %s: %s",
+                     email_type, response.status_code)
+        
+        if response.status_code == 201:
+            response_data = response.json()
+            message_id = response_data.get('messageId', 'Unknown')
+            logger.info("✅ %s email accepted by Brevo! Message ID: %s",
+                        email_type.capitalize(), message_id)
+            return True
+        else:
+            error_details = response.text
+            logger.error("❌ Brevo API Error for %s: %s - %s",
+                         email_type, response.status_code, error_details)
+            return False
+            
+    except httpx.TimeoutException:
+        logger.error("❌ Brevo API timeout for %s email to %s", email_type, recipient)
+        return False
+    except Exception as e:
+        logger.error("❌ Unexpected error sending %s email: %s", email_type, e)
+        return False
+
+
+# Approval/rejection emails are queued so the admin request doesn't wait on Brevo
+EMAIL_QUEUE_SIZE = 1000
+EMAIL_WORKERS = 4
+EMAIL_DRAIN_TIMEOUT = 10  # seconds shutdown waits for queued emails
+
+_email_queue: asyncio.Queue = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+
+
+def enqueue_brevo_email(headers: dict, payload: dict, recipient: str, email_type: str) -> bool:
+    """Queue a Brevo payload for the background workers; False if the queue is full"""
+    try:
+        _email_queue.put_nowait((headers, payload, recipient, email_type))
+        return True
+    except asyncio.QueueFull:
+        logger.error("❌ Email queue full, dropping %s email to %s",
+                     email_type, recipient)
+        return False
+
+
+async def _email_worker():
+    while True:
+        headers, payload, recipient, email_type = await _email_queue.get()
+        try:
+            await post_brevo_email(headers, payload, recipient, email_type)
+        finally:
+            _email_queue.task_done()
+
+
+async def run_email_workers(workers: int = EMAIL_WORKERS):
+    """Background task draining the email queue with a few concurrent senders"""
+    await asyncio.gather(*(_email_worker() for _ in range(workers)))
+
+
+async def drain_email_queue(timeout: float = EMAIL_DRAIN_TIMEOUT) -> bool:
+    """Wait for queued emails to be sent (call before stopping the workers); False on timeout"""
+    try:
+        await asyncio.wait_for(_email_queue.join(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ %s queued emails not sent before shutdown",
+                       _email_queue.qsize())
+        return False
+
+
+class EmailSender:
+    def __init__(self):
+        self.brevo_api_key = os.getenv("BREVO_API_KEY")
+        self.brevo_from_email = os.getenv("BREVO_FROM_EMAIL", "noreply@ridealert.com")
+        # Fixed per instance, so build them once instead of per send
+        self._sender = {"name": "RideAlert", "email": self.brevo_from_email}
+        self._api_headers = {
+            "accept": "application/json",
+            "api-key": self.brevo_api_key,
+            "content-type": "application/json"
+        }
+        
+        logger.info("🔧 Brevo Config Loaded: from=%s, api key %s",
+                    self.brevo_from_email, "set" if self.brevo_api_key else "NOT SET")
+        
+    def generate_otp(self) -> str:
+        """Generate a 6-digit OTP (000000-999999, leading zeros kept)"""
+        return f"{secrets.randbelow(1_000_000):06d}"
+    
+    def store_otp(self, email: str, otp: str):
+        """Store OTP with expiration (OTP_TTL, 10 minutes)"""
+        # A fixed TTL keeps store order equal to expiry order, which the
+        # cap and purge_expired_otps rely on
+        otp_store[email] = (otp, time.monotonic() + OTP_TTL)
+        otp_store.move_to_end(email)
+        # Bound memory even if sends outpace the sweeper
+        while len(otp_store) > OTP_MAX_ENTRIES:
+            otp_store.popitem(last=False)
+    
+    def verify_otp(self, email: str, otp: str) -> bool:
+        """Verify OTP and clean up if valid"""
+        if email not in otp_store:
+            return False
+        
+        stored_otp, expires_at = otp_store[email]
+        
+        if time.monotonic() > expires_at:
+            del otp_store[email]
+            return False
+        
+        # Constant-time comparison so response timing doesn't leak digits
+        # (bytes, since compare_digest rejects non-ASCII str input)
+        if hmac.compare_digest(stored_otp.encode(), str(otp).encode()):
+            del otp_store[email]
+            return True
+        
+        return False
+
+    def _create_email_payload(self, to_email: str, to_name: str, subject: str, html_content: str, text_content: str, tags: list, headers: dict = None) -> dict:
+        """Create optimized email payload with anti-spam measures"""
+        base_payload = {
+            "sender": self._sender,
+            "to": [
+                {
+                    "email": to_email,
+                    "name": to_name
+                }
+            ],
+            "subject": subject,
+            "htmlContent": html_content,
+            "textContent": text_content,
+            "tags": tags,
+            # Only copy the shared headers when custom ones are added
+            "headers": {**EMAIL_HEADERS, **headers} if headers else EMAIL_HEADERS,
+            "params": EMAIL_PARAMS
+        }
+            
+        return base_payload
+
+    async def send_verification_email(self, email: str, otp: str) -> bool:
+        """
+        Send the OTP email. Repeat requests for an address whose send is
+        still in flight share that send instead of firing another one.
+        """
+        inflight = _inflight_verifications.get(email)
+        if inflight:
+            inflight_otp, future = inflight
+            # The caller stored a fresh OTP; restore the one being emailed
+            self.store_otp(email, inflight_otp)
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        _inflight_verifications[email] = (otp, future)
+        try:
+            result = await self._send_verification_email(email, otp)
+            if result:
+                # Only a delivered code starts the resend cooldown
+                verification_send_limiter.record(email)
+            future.set_result(result)
+            return result
+        finally:
+            if not future.done():
+                future.set_result(False)
+            _inflight_verifications.pop(email, None)
+
+    async def _send_verification_email(self, email: str, otp: str) -> bool:
+        try:
+            logger.info("📧 Attempting to send verification email to: %s", email)
+            
+            if not self.brevo_api_key:
+                error_msg = "Brevo configuration incomplete - check BREVO_API_KEY"
+                logger.error("❌ %s", error_msg)
+                raise ValueError(error_msg)
+            
+            # Improved email content with anti-spam optimization
+            subject = "Verify Your RideAlert Account"
+            html_content = self._create_verification_html(otp)
+            text_content = self._create_verification_text(otp)
+            
+            payload = self._create_email_payload(
+                to_email=email,
+                to_name=email.split('@')[0],
+                subject=subject,
+                html_content=html_content,
+                text_content=text_content,
+                tags=["verification", "authentication", "transactional"],
+                headers={
+                    "X-Template": "account-verification"
+                }
+            )
+            
+            return await post_brevo_email(self._api_headers, payload, email, "verification")
+                
+        except Exception as e:
+            logger.exception("❌ Unexpected error in verification email: %s", e)
+            return False
+
+    def verification_cooldown_active(self, email: str) -> bool:
+        """
+        True if a code was emailed to this address within the cooldown.
+        Requests for an address whose send is still in flight pass, so they
+        can share that send.
+        """
+        if email in _inflight_verifications:
+            return False
+        return verification_send_limiter.is_rate_limited(email, record=False)
+
+    def _create_verification_html(self, otp: str) -> str:
+        return _VERIFICATION_HTML_PREFIX + otp + _VERIFICATION_HTML_SUFFIX
+
+    def _create_verification_text(self, otp: str) -> str:
+        return _VERIFICATION_TEXT_PREFIX + otp + _VERIFICATION_TEXT_SUFFIX
+
+
+class ApprovalEmailSender:
+    def __init__(self):
+        self.brevo_api_key = os.getenv("BREVO_API_KEY")
+        self.brevo_from_email = os.getenv("BREVO_FROM_EMAIL", "noreply@ridealert.com")
+        # Fixed per instance, so build them once instead of per send
+        self._sender = {"name": "RideAlert Fleet Management", "email": self.brevo_from_email}
+        self._api_headers = {
+            "accept": "application/json",
+            "api-key": self.brevo_api_key,
+            "content-type": "application/json"
+        }
+    
+    async def send_approval_email(self, company_email: str, company_name: str, login_credentials: dict = None) -> bool:
+        """
+        Send approval email to company with login credentials
+        """
+        try:
+            logger.info("📧 Sending approval email to: %s", company_email)
+
+            if not self.brevo_api_key:
+                error_msg = "Brevo configuration incomplete - check BREVO_API_KEY"
+                logger.error("❌ %s", error_msg)
+                return False
+
+            limiter_key = f"approval:{company_email}"
+            if company_email_limiter.is_rate_limited(limiter_key, record=False):
+                logger.warning("⚠️ Skipping approval email to %s, one was sent recently", company_email)
+                return False
+            
+            subject = f"Registration Approved - Welcome to RideAlert, {company_name}!"
+            html_content = self._create_approval_html(company_name, company_email, login_credentials)
+            text_content = self._create_approval_text(company_name, company_email, login_credentials)
+            
+            payload = {
+                "sender": self._sender,
+                "to": [
+                    {
+                        "email": company_email,
+                        "name": company_name
+                    }
+                ],
+                "subject": subject,
+                "htmlContent": html_content,
+                "textContent": text_content,
+                "headers": _APPROVAL_EMAIL_HEADERS,
+                "tags": ["approval", "onboarding", "transactional"],
+                "params": EMAIL_PARAMS
+            }
+            
+            queued = enqueue_brevo_email(self._api_headers, payload, company_email, "approval")
+            if queued:
+                company_email_limiter.record(limiter_key)
+            return queued
+                
+        except Exception as e:
+            logger.error("❌ Error sending approval email: %s", e)
+            return False
+
+    def _create_approval_html(self, company_name: str, company_email: str, login_credentials: dict) -> str:
+        login_url = login_credentials.get('login_url', 'https://ridealertadminpanel.onrender.com') if login_credentials else 'https://ridealertadminpanel.onrender.com'
+        
+        return _render_approval(company_name, company_email, login_url)[0]
+
+    def _create_approval_text(self, company_name: str, company_email: str, login_credentials: dict) -> str:
+        login_url = login_credentials.get('login_url', 'https://ridealertadminpanel.onrender.com') if login_credentials else 'https://ridealertadminpanel.onrender.com'
+        
+        return _render_approval(company_name, company_email, login_url)[1]
+
+
+class RejectionEmailSender:
+    def __init__(self):
+        self.brevo_api_key = os.getenv("BREVO_API_KEY")
+        self.brevo_from_email = os.getenv("BREVO_FROM_EMAIL", "noreply@ridealert.com")
+        # Fixed per instance, so build them once instead of per send
+        self._sender = {"name": "RideAlert Fleet Management", "email": self.brevo_from_email}
+        self._api_headers = {
+            "accept": "application/json",
+            "api-key": self.brevo_api_key,
+            "content-type": "application/json"
+        }
+    
+    async def send_rejection_email(self, company_email: str, company_name: str, rejection_reason: str = None) -> bool:
+        """
+        Send rejection email to company with optional reason
+        """
+        try:
+            logger.info("📧 Sending rejection email to: %s", company_email)
+
+            if not self.brevo_api_key:
+                error_msg = "Brevo configuration incomplete - check BREVO_API_KEY"
+                logger.error("❌ %s", error_msg)
+                return False
+
+            limiter_key = f"rejection:{company_email}"
+            if company_email_limiter.is_rate_limited(limiter_key, record=False):
+                logger.warning("⚠️ Skipping rejection email to %s, one was sent recently", company_email)
+                return False
+            
+            subject = f"Update on Your RideAlert Registration - {company_name}"
+            html_content = self._create_rejection_html(company_name, rejection_reason)
+            text_content = self._create_rejection_text(company_name, rejection_reason)
+            
+            payload = {
+                "sender": self._sender,
+                "to": [
+                    {
+                        "email": company_email,
+                        "name": company_name
+                    }
+                ],
+                "subject": subject,
+                "htmlContent": html_content,
+                "textContent": text_content,
+                "headers": _REJECTION_EMAIL_HEADERS,
+                "tags": ["rejection", "registration", "transactional"],
+                "params": EMAIL_PARAMS
+            }
+            
+            queued = enqueue_brevo_email(self._api_headers, payload, company_email, "rejection")
+            if queued:
+                company_email_limiter.record(limiter_key)
+            return queued
+                
+        except Exception as e:
+            logger.error("❌ Error sending rejection email: %s", e)
+            return False
+
+    def _create_rejection_html(self, company_name: str, rejection_reason: str) -> str:
+        return _render_rejection(company_name, rejection_reason)[0]
+
+    def _create_rejection_text(self, company_name: str, rejection_reason: str) -> str:
+        return _render_rejection(company_name, rejection_reason)[1]
 
 # Global email sender instances
 email_sender = EmailSender()
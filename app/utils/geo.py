@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 #to calculate the distance from user to vehicle
 def haversine(lat1, lon1, lat2, lon2):
     R = 6371000  # meters
@@ -8,4 +10,24 @@ def haversine(lat1, lon1, lat2, lon2):
     dphi = math.radians(lat2 - lat1)
     dlambda = math.radians(lon2 - lon1)
     a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return 2*R*math.atan2(math.sqrt(a), math.sqrt(1 - a))
\ No newline at end of file
+    return 2*R*math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+#pairwise distances (meters) between every point in a and every point in b,
+#in one vectorized pass; returns an array of shape (len(a), len(b))
+def haversine_matrix(lats_a, lons_a, lats_b, lons_b):
+    R = 6371000  # meters
+    phi1 = np.radians(np.asarray(lats_a, dtype=np.float64))[:, None]
+    phi2 = np.radians(np.asarray(lats_b, dtype=np.float64))[None, :]
+    lam1 = np.radians(np.asarray(lons_a, dtype=np.float64))[:, None]
+    lam2 = np.radians(np.asarray(lons_b, dtype=np.float64))[None, :]
+    a = np.sin((phi2 - phi1) / 2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin((lam2 - lam1) / 2)**2
+    return 2*R*np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+#bounding box around a point, for a cheap indexed prefilter before haversine
+def bounding_box(lat, lon, radius_m):
+    R = 6371000  # meters
+    dlat = math.degrees(radius_m / R)
+    dlon = math.degrees(radius_m / (R * max(math.cos(math.radians(lat)), 1e-6)))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
@@ -10,4 +10,16 @@ def haversine_code(lat1, lon1, lat2, lon2):
     a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     distance = R * c
-    return distance
\ No newline at end of file
+    return distance
+
+
+def within_radius(lat1, lon1, lat2, lon2, radius_m):
+    """
+    Cheap equirectangular check (one cos, no atan2/sqrt). Accurate to well
+    under a meter at the few-hundred-meter radii used for notifications, so
+    it can rule out far-away pairs before calling haversine_code.
+    """
+    R = 6371000  # Radius of Earth in meters
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return R * R * (x * x + y * y) <= radius_m * radius_m
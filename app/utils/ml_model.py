@@ -1,10 +1,21 @@
 import joblib
+import logging
 import os
 from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .model_downloader import ensure_models_exist
 
+logger = logging.getLogger(__name__)
+
 ML_DIR = os.path.join(os.path.dirname(__file__), '../ml')
 
+# (attribute, filename) for the small preprocessing artifacts
+SMALL_ARTIFACTS = (
+    ("scaler", "robust_scaler_v6.pkl"),
+    ("features", "enhanced_features_v6.pkl"),
+    ("label_encoders", "enhanced_label_encoders_v6.pkl"),
+)
+
 
 class MLModelManager:
     def __init__(self):
@@ -27,7 +38,7 @@ class MLModelManager:
 
     def _load_all_optimized(self):
         """Memory-optimized model loading for Railway deployment"""
-        print("🔧 Starting memory-optimized model loading...")
+        logger.info("🔧 Starting memory-optimized model loading...")
 
         # Ensure models are downloaded first
         ensure_models_exist()
@@ -35,26 +46,22 @@ class MLModelManager:
         try:
             import gc  # For garbage collection
 
-            print("📦 Loading models one by one to optimize memory...")
-
-            # Load scaler first (smallest)
-            print("🔧 Loading scaler...")
-            self.scaler = self._load_pickle('robust_scaler_v6.pkl')
-            gc.collect()
-
-            # Load features
-            print("🔧 Loading features...")
-            self.features = self._load_pickle('enhanced_features_v6.pkl')
-            gc.collect()
-
-            # Load label encoders
-            print("🔧 Loading label encoders...")
-            self.label_encoders = self._load_pickle(
-                'enhanced_label_encoders_v6.pkl')
+            logger.debug("📦 Loading models one by one to optimize memory...")
+
+            # Scaler, features and label encoders are small, so read them
+            # together; the large model still loads on its own below
+            logger.debug("🔧 Loading scaler, features and label encoders...")
+            with ThreadPoolExecutor(max_workers=len(SMALL_ARTIFACTS)) as executor:
+                futures = {
+                    executor.submit(self._load_pickle, filename): attr
+                    for attr, filename in SMALL_ARTIFACTS
+                }
+                for future in as_completed(futures):
+                    setattr(self, futures[future], future.result())
             gc.collect()
 
             # Load only gradient boosting model (not using random forest)
-            print("🔧 Loading gradient boosting model...")
+            logger.debug("🔧 Loading gradient boosting model...")
             self.models['gradient_boosting'] = self._load_pickle(
                 'gradient_boosting_model_v6.pkl')
             gc.collect()
@@ -65,42 +72,11 @@ class MLModelManager:
             #     'random_forest_model_v6.pkl')
             # gc.collect()
 
-            print("✅ Memory-optimized model loading completed!")
-            self._models_loaded = True
-
-        except Exception as e:
-            print(f"❌ Memory-optimized loading failed: {e}")
-            raise
-
-    def _load_all(self):
-        """Load all models, downloading them first if needed"""
-        print("Initializing ML models...")
-
-        # Ensure models are downloaded first
-        ensure_models_exist()
-
-        try:
-            print("Loading models...")
-            self.models['gradient_boosting'] = self._load_pickle(
-                'gradient_boosting_model_v6.pkl')
-            # self.models['random_forest'] = self._load_pickle(
-            #     'random_forest_model_v6.pkl')  # Commented out - using only gradient boosting
-            self.scaler = self._load_pickle('robust_scaler_v6.pkl')
-            self.features = self._load_pickle('enhanced_features_v6.pkl')
-            self.label_encoders = self._load_pickle(
-                'enhanced_label_encoders_v6.pkl')
-
-            print("✅ All models loaded successfully")
+            logger.info("✅ Memory-optimized model loading completed!")
             self._models_loaded = True
 
-            # Print valid classes for each label-encoded feature
-            if self.label_encoders:
-                for feat, encoder in self.label_encoders.items():
-                    print(
-                        f"Valid classes for '{feat}': {list(encoder.classes_)}")
-
         except Exception as e:
-            print(f"❌ Error loading models: {e}")
+            logger.error("❌ Memory-optimized loading failed: %s", e)
             raise
 
     def _load_pickle(self, filename):
@@ -114,16 +90,16 @@ class MLModelManager:
     def _load_all(self):
         """Load all models with memory optimization for Railway"""
         import gc
-        print("🧠 Initializing ML models with memory optimization...")
+        logger.info("🧠 Initializing ML models with memory optimization...")
 
         # Ensure models are downloaded first
         ensure_models_exist()
 
         try:
-            print("📦 Loading models one by one with garbage collection...")
+            logger.debug("📦 Loading models one by one with garbage collection...")
 
             # Load models sequentially with garbage collection between each
-            print("Loading gradient boosting model...")
+            logger.debug("Loading gradient boosting model...")
             self.models['gradient_boosting'] = self._load_pickle(
                 'gradient_boosting_model_v6.pkl')
 
@@ -132,32 +108,32 @@ class MLModelManager:
             # self.models['random_forest'] = self._load_pickle(
             #     'random_forest_model_v6.pkl')
 
-            print("Loading scaler...")
+            logger.debug("Loading scaler...")
             self.scaler = self._load_pickle('robust_scaler_v6.pkl')
 
-            print("Loading features...")
+            logger.debug("Loading features...")
             self.features = self._load_pickle('enhanced_features_v6.pkl')
 
-            print("Loading label encoders...")
+            logger.debug("Loading label encoders...")
             self.label_encoders = self._load_pickle(
                 'enhanced_label_encoders_v6.pkl')
 
-            print("✅ All models loaded successfully with memory optimization")
+            logger.info("✅ All models loaded successfully with memory optimization")
             self._models_loaded = True
 
             # Print valid classes for each label-encoded feature
             if self.label_encoders:
                 for feat, encoder in self.label_encoders.items():
-                    print(
-                        f"Valid classes for '{feat}': {list(encoder.classes_)}")
+                    logger.debug("Valid classes for '%s': %s",
+                                 feat, list(encoder.classes_))
 
         except MemoryError as me:
-            print(f"💾 Memory error during model loading: {me}")
-            print("⚠️ Railway memory limit exceeded - consider upgrading plan")
+            logger.error("💾 Memory error during model loading: %s", me)
+            logger.warning("⚠️ Railway memory limit exceeded - consider upgrading plan")
             raise MemoryError(
                 "Railway memory limit exceeded during model loading")
         except Exception as e:
-            print(f"❌ Error loading models: {e}")
+            logger.error("❌ Error loading models: %s", e)
             raise
 
     def preprocess(self, input_data: Dict[str, Any]):
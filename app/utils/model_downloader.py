@@ -1,21 +1,72 @@
+import hashlib
 import os
 import requests
 from pathlib import Path
 import gdown
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+# Model files are tens of MB; large reads keep per-chunk overhead low
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _model_env_var(model_name):
+    """enhanced_features_v6.pkl -> ENHANCED_FEATURES_V6"""
+    return model_name.replace('.pkl', '').upper()
+
+
+def is_model_file_valid(path, model_name=None):
+    """
+    True if the model file exists and, when <ENV_VAR>_SHA256 is set, its
+    sha256 matches. Cached files that fail the check get re-downloaded.
+    """
+    if not os.path.exists(path):
+        return False
+
+    model_name = model_name or os.path.basename(path)
+    expected = os.getenv(f"{_model_env_var(model_name)}_SHA256")
+    if not expected:
+        return True
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    if digest.hexdigest() != expected.strip().lower():
+        print(f"⚠️ Checksum mismatch for {model_name}")
+        return False
+    return True
+
 
 def download_with_progress(url, output_path, timeout=300):
-    """Download file with progress bar and timeout"""
+    """
+    Download file with progress bar and timeout. Data goes to a .part file
+    that is renamed into place once complete, so an interrupted download
+    never leaves a truncated model behind.
+    """
+    model_name = os.path.basename(output_path)
+    part_path = f"{output_path}.part"
     try:
-        print(f"🔄 Starting download: {os.path.basename(output_path)}")
-        start_time = time.time()
+        _download(url, part_path, model_name, timeout)
+        if not is_model_file_valid(part_path, model_name):
+            raise Exception(
+                f"Downloaded {model_name} failed checksum verification")
+        os.replace(part_path, output_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def _download(url, output_path, model_name, timeout):
+    try:
+        print(f"🔄 Starting download: {model_name}")
+        start_time = time.monotonic()
 
         # Try gdown first (better for Google Drive)
         gdown.download(url, str(output_path), quiet=False)
 
-        download_time = time.time() - start_time
+        download_time = time.monotonic() - start_time
         size_mb = os.path.getsize(output_path) / (1024 * 1024)
         print(f"✅ Download complete: {size_mb:.1f} MB in {download_time:.1f}s")
 
@@ -31,17 +82,17 @@ def download_with_progress(url, output_path, timeout=300):
 
         with open(output_path, 'wb') as f:
             if total_size > 0:
-                with tqdm(total=total_size, unit='B', unit_scale=True, desc=os.path.basename(output_path)) as pbar:
-                    for chunk in response.iter_content(chunk_size=8192):
+                with tqdm(total=total_size, unit='B', unit_scale=True, desc=model_name) as pbar:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                         if chunk:
                             f.write(chunk)
                             pbar.update(len(chunk))
             else:
-                for chunk in response.iter_content(chunk_size=8192):
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                     if chunk:
                         f.write(chunk)
 
-        download_time = time.time() - start_time
+        download_time = time.monotonic() - start_time
         size_mb = os.path.getsize(output_path) / (1024 * 1024)
         print(
             f"✅ Fallback download complete: {size_mb:.1f} MB in {download_time:.1f}s")
@@ -72,27 +123,39 @@ def download_models():
         print(f"⚠️ Missing environment variables for: {missing_urls}")
         print("📋 Required environment variables:")
         for name in missing_urls:
-            env_var = name.replace('.pkl', '').upper()
+            env_var = _model_env_var(name)
             print(f"   - {env_var}")
         raise Exception(
             f"Missing environment variables for model URLs: {missing_urls}")
 
-    total_start_time = time.time()
+    total_start_time = time.monotonic()
 
+    pending = {}
     for model_name, url in models.items():
         if url:
             model_path = models_dir / model_name
-            if not model_path.exists():
-                try:
-                    download_with_progress(url, model_path)
-                except Exception as e:
-                    print(f"❌ Failed to download {model_name}: {e}")
-                    raise
+            if not is_model_file_valid(model_path):
+                pending[model_name] = (url, model_path)
             else:
                 size_mb = os.path.getsize(model_path) / (1024 * 1024)
                 print(f"✅ {model_name} already exists ({size_mb:.1f} MB)")
 
-    total_time = time.time() - total_start_time
+    # Downloads are network-bound, so fetch all missing models at once;
+    # total time becomes the slowest single download instead of the sum
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            futures = {
+                executor.submit(download_with_progress, url, model_path): model_name
+                for model_name, (url, model_path) in pending.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ Failed to download {futures[future]}: {e}")
+                    raise
+
+    total_time = time.monotonic() - total_start_time
     print(f"🎉 All models ready! Total time: {total_time:.1f}s")
 
 
@@ -106,7 +169,7 @@ def ensure_models_exist():
         "app/ml/robust_scaler_v6.pkl"
     ]
 
-    missing_files = [f for f in required_files if not os.path.exists(f)]
+    missing_files = [f for f in required_files if not is_model_file_valid(f)]
 
     if missing_files:
         print(f"Missing model files: {missing_files}")
@@ -29,33 +29,40 @@
 
 from app.utils.haversine import haversine_code
 from bson import ObjectId, errors
-from app.database import user_collection, notification_logs_collection
+from app.database import async_user_collection, async_notification_logs_collection
 from app.utils.firebase import send_push_notification
 import asyncio
 from datetime import datetime, timedelta
 import logging
 from pytz import timezone
+from collections import namedtuple
 
 ph_tz = timezone("Asia/Manila")
 
+# Lightweight location with the attribute access check_and_notify expects
+LatLng = namedtuple("LatLng", ["latitude", "longitude"])
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def check_and_notify(user_id, user_location, vehicle_location, vehicle_id=None, fleet_id=None):
+async def check_and_notify(user_id, user_location, vehicle_location, vehicle_id=None, fleet_id=None, distance=None):
     """
     Check distance between user and vehicle and send tiered notifications:
     - <=500m: first notification (ONCE)
     - <=100m: second notification (ONCE)
     - Reset both if distance >500m
+
+    Callers that already computed the distance in bulk can pass it in.
     """
     try:
         # Calculate distance
-        distance = haversine_code(
-            user_location.latitude,
-            user_location.longitude,
-            vehicle_location.latitude,
-            vehicle_location.longitude
-        )
+        if distance is None:
+            distance = haversine_code(
+                user_location.latitude,
+                user_location.longitude,
+                vehicle_location.latitude,
+                vehicle_location.longitude
+            )
         logger.info(f"Distance for user {user_id} vehicle {vehicle_id}: {distance:.1f}m")
 
         # Query for existing log with ALL matching fields
@@ -64,12 +71,12 @@ async def check_and_notify(user_id, user_location, vehicle_location, vehicle_id=
             "vehicle_id": vehicle_id,
             "fleet_id": ObjectId(fleet_id)
         }
-        state = notification_logs_collection.find_one(query)
+        state = await async_notification_logs_collection.find_one(query)
 
         if distance > 500:
             # Reset notifications if user moves away
             if state:
-                notification_logs_collection.update_one(
+                await async_notification_logs_collection.update_one(
                     query,
                     {
                         "$set": {
@@ -85,7 +92,7 @@ async def check_and_notify(user_id, user_location, vehicle_location, vehicle_id=
 
         # Initialize state if first time
         if not state:
-            notification_logs_collection.insert_one({
+            await async_notification_logs_collection.insert_one({
                 "user_id": ObjectId(user_id),
                 "vehicle_id": vehicle_id,
                 "fleet_id": ObjectId(fleet_id),
@@ -134,7 +141,7 @@ async def check_and_notify(user_id, user_location, vehicle_location, vehicle_id=
                 "last_distance": distance,
                 "timestamp": datetime.now(ph_tz)
             })
-            notification_logs_collection.update_one(query, {"$set": updates})
+            await async_notification_logs_collection.update_one(query, {"$set": updates})
             logger.info(f"💾 Updated notification state: {updates}")
 
         return notified
@@ -148,7 +155,7 @@ async def _send_tiered_notification(user_id, title, body, vehicle_id=None):
     Send FCM notification AND insert a log into notification_logs_collection
     """
     try:
-        user_data = user_collection.find_one({"_id": ObjectId(user_id)})
+        user_data = await async_user_collection.find_one({"_id": ObjectId(user_id)})
         if not user_data or not user_data.get("fcm_token"):
             logger.error(f"❌ No FCM token for user {user_id}")
             return False
@@ -164,7 +171,7 @@ async def _send_tiered_notification(user_id, title, body, vehicle_id=None):
 
         if result:
             # Insert log for frontend
-            notification_logs_collection.insert_one({
+            await async_notification_logs_collection.insert_one({
                 "user_id": ObjectId(user_id),
                 "fleet_id": ObjectId(user_data.get("fleet_id")),
                 "vehicle_id": vehicle_id,
@@ -200,7 +207,7 @@ async def send_proximity_notification(user_id, vehicle_id, distance):
     Send proximity notification for specific user and vehicle
     """
     try:
-        user_data = user_collection.find_one({"_id": ObjectId(user_id)})
+        user_data = await async_user_collection.find_one({"_id": ObjectId(user_id)})
         if not user_data:
             logger.error(f"User {user_id} not found")
             return False
@@ -211,7 +218,7 @@ async def send_proximity_notification(user_id, vehicle_id, distance):
             return False
         
         # Check if notification was sent recently
-        recent_notification = notification_logs_collection.find_one({
+        recent_notification = await async_notification_logs_collection.find_one({
             "user_id": user_id,
             "vehicle_id": vehicle_id,
             "timestamp": {"$gte": datetime.utcnow() - timedelta(minutes=5)}
@@ -229,7 +236,7 @@ async def send_proximity_notification(user_id, vehicle_id, distance):
         
         if success:
             # Log the notification
-            notification_logs_collection.insert_one({
+            await async_notification_logs_collection.insert_one({
                 "user_id": user_id,
                 "vehicle_id": vehicle_id,
                 "distance": distance,
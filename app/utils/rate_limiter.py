@@ -1,27 +1,43 @@
 import time
-from collections import defaultdict
+from typing import Dict, List, Optional
 from fastapi import HTTPException, status
 
 class RateLimiter:
     def __init__(self, max_requests: int = 5, window: int = 900):  # 5 requests per 15 minutes
         self.max_requests = max_requests
         self.window = window
-        self.requests = defaultdict(list)
+        self.requests: Dict[str, List[float]] = {}
     
-    def is_rate_limited(self, key: str) -> bool:
-        now = time.time()
+    def is_rate_limited(self, key: str, record: bool = True) -> bool:
+        """Check a key against the window; counts this request unless record=False"""
+        now = time.monotonic()
         window_start = now - self.window
         
-        # Clean old requests
-        self.requests[key] = [req_time for req_time in self.requests[key] if req_time > window_start]
+        # Clean old requests, dropping keys that have none left
+        recent = [req_time for req_time in self.requests.get(key, ()) if req_time > window_start]
+        if recent:
+            self.requests[key] = recent
+        else:
+            self.requests.pop(key, None)
         
         # Check if rate limited
-        if len(self.requests[key]) >= self.max_requests:
+        if len(recent) >= self.max_requests:
             return True
         
         # Add current request
-        self.requests[key].append(now)
+        if record:
+            self.record(key, now)
         return False
 
+    def record(self, key: str, now: Optional[float] = None):
+        """Count a request for key (e.g. once the action it guards has succeeded)"""
+        self.requests.setdefault(key, []).append(time.monotonic() if now is None else now)
+
 # Global rate limiter instance
-email_rate_limiter = RateLimiter()
\ No newline at end of file
+email_rate_limiter = RateLimiter()
+
+# At most one verification email per address per minute
+verification_send_limiter = RateLimiter(max_requests=1, window=60)
+
+# At most one approval/rejection email per address per 10 minutes
+company_email_limiter = RateLimiter(max_requests=1, window=600)
\ No newline at end of file
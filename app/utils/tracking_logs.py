@@ -1,9 +1,28 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.database import async_db
+import asyncio
+import logging
 import time
 
+logger = logging.getLogger(__name__)
 
-def insert_gps_log(db, device_id: str, fleet_id: str, ml_request_data: dict, corrected_coordinates: dict, ecef_coordinates: dict | None = None, moved_point: dict | None = None):
+# Tracking logs are buffered and written with insert_many instead of one
+# insert_one per prediction; a batch is flushed when it reaches
+# GPS_LOG_BATCH_SIZE entries or GPS_LOG_FLUSH_INTERVAL seconds after its
+# first entry, whichever comes first.
+GPS_LOG_BATCH_SIZE = 500
+GPS_LOG_FLUSH_INTERVAL = 0.25
+GPS_LOG_QUEUE_MAXSIZE = 10000
+# A failed batch is retried once before it is dropped
+GPS_LOG_FLUSH_ATTEMPTS = 2
+
+# Set while gps_log_flusher() is running; None means insert directly
+_gps_log_queue: asyncio.Queue | None = None
+
+
+async def insert_gps_log(db, device_id: str, fleet_id: str, ml_request_data: dict, corrected_coordinates: dict, ecef_coordinates: dict | None = None, moved_point: dict | None = None):
     """
     Insert ML prediction log into MongoDB Atlas with complete sensor data structure
 
@@ -130,10 +149,69 @@ def insert_gps_log(db, device_id: str, fleet_id: str, ml_request_data: dict, cor
     if moved_point is not None:
         log_entry["moved_point"] = moved_point
 
-    # Insert as a new document (not pushing to array)
-    result = db["tracking_logs"].insert_one(log_entry)
+    # Insert as a new document (not pushing to array). The _id is generated
+    # here, so it can be returned before the batched write lands.
+    inserted_id = log_entry["_id"]
+    try:
+        if _gps_log_queue is None:
+            raise asyncio.QueueFull
+        _gps_log_queue.put_nowait(log_entry)
+    except asyncio.QueueFull:
+        # Backpressure: write this one directly, off the event loop
+        result = await asyncio.to_thread(db["tracking_logs"].insert_one, log_entry)
+        inserted_id = result.inserted_id
 
     print(
         f"📝 Enhanced tracking log inserted: Fleet {fleet_id}, Device {device_id}, Raw: ({raw_latitude:.6f}, {raw_longitude:.6f}), Final: ({corrected_coordinates['latitude']:.6f}, {corrected_coordinates['longitude']:.6f})")
 
-    return result.inserted_id  # Return the inserted document ID
+    return inserted_id  # Return the inserted document ID
+
+
+async def _flush_gps_logs(batch: list):
+    if not batch:
+        return
+    for attempt in range(1, GPS_LOG_FLUSH_ATTEMPTS + 1):
+        try:
+            # ordered=False lets the server keep going past a bad document
+            await async_db["tracking_logs"].insert_many(batch, ordered=False)
+            return
+        except Exception as e:
+            # _ids are assigned up front, so documents that already landed
+            # come back as duplicate keys on a retry rather than twice
+            if isinstance(e, BulkWriteError):
+                errors = e.details.get("writeErrors", [])
+                if errors and all(err.get("code") == 11000 for err in errors):
+                    return
+            if attempt < GPS_LOG_FLUSH_ATTEMPTS:
+                logger.warning("Retrying flush of %d tracking logs: %s", len(batch), e)
+            else:
+                logger.exception("Failed to flush %d tracking logs", len(batch))
+
+
+async def gps_log_flusher():
+    """Background task that drains queued tracking logs in batches"""
+    global _gps_log_queue
+    queue = asyncio.Queue(maxsize=GPS_LOG_QUEUE_MAXSIZE)
+    _gps_log_queue = queue
+    loop = asyncio.get_running_loop()
+    batch = []
+    try:
+        while True:
+            batch.append(await queue.get())
+            deadline = loop.time() + GPS_LOG_FLUSH_INTERVAL
+            while len(batch) < GPS_LOG_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            pending, batch = batch, []
+            await _flush_gps_logs(pending)
+    finally:
+        # Stop accepting new entries and write whatever is still buffered
+        _gps_log_queue = None
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        await _flush_gps_logs(batch)
@@ -0,0 +1,99 @@
+"""
+Cross-worker fan-out for websocket location updates.
+
+Subscriber lists live in each Uvicorn worker's memory, so a broadcast from
+one worker never reaches sockets held by another. When REDIS_URL is set,
+updates are published to a Redis channel per vehicle and every worker runs
+a listener that delivers them to its own local subscribers. Without
+REDIS_URL everything stays in-process (single worker deployments).
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Union
+
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+VEHICLE_CHANNEL_PREFIX = "veh:"
+
+_redis = None
+
+
+def pubsub_enabled() -> bool:
+    return bool(REDIS_URL)
+
+
+def _get_redis():
+    """Lazily create the shared Redis client (redis is only needed when REDIS_URL is set)"""
+    global _redis
+    if _redis is None:
+        import redis.asyncio as redis
+        _redis = redis.from_url(REDIS_URL)
+    return _redis
+
+
+async def publish_vehicle_update(vehicle_id: str, message: Union[dict, str], include_global: bool = False) -> bool:
+    """
+    Publish a vehicle update for all workers. Returns False when pub/sub is
+    disabled or publishing failed, so the caller can deliver locally instead.
+    Pre-encoded JSON text is carried as-is so listeners don't re-encode it.
+    """
+    if not pubsub_enabled():
+        return False
+
+    envelope = {
+        "vehicle_id": vehicle_id,
+        "include_global": include_global,
+        "message": message
+    }
+    try:
+        await _get_redis().publish(
+            f"{VEHICLE_CHANNEL_PREFIX}{vehicle_id}", orjson.dumps(envelope))
+        return True
+    except Exception as e:
+        logger.error("Redis publish failed for vehicle %s: %s", vehicle_id, e)
+        return False
+
+
+async def run_vehicle_update_listener(handler: Callable[[str, Union[dict, str], bool], Awaitable[None]]):
+    """Deliver every published vehicle update to this worker's local subscribers"""
+    if not pubsub_enabled():
+        return
+
+    while True:
+        pubsub = None
+        try:
+            pubsub = _get_redis().pubsub()
+            await pubsub.psubscribe(f"{VEHICLE_CHANNEL_PREFIX}*")
+            logger.info("Redis vehicle update listener subscribed")
+
+            async for item in pubsub.listen():
+                if item.get("type") != "pmessage":
+                    continue
+                try:
+                    envelope = orjson.loads(item["data"])
+                    await handler(
+                        envelope["vehicle_id"],
+                        envelope["message"],
+                        envelope.get("include_global", False)
+                    )
+                except Exception:
+                    logger.exception("Failed to fan out Redis vehicle update")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Redis vehicle update listener error")
+            await asyncio.sleep(5)  # Wait before reconnecting
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
@@ -24,7 +24,8 @@ def background_status_checker():
             # Find the latest tracking log for this device using string device id
             str_device_id = str(device_id)
             latest_log = db.tracking_logs.find_one(
-                {"device_id": str_device_id}, sort=[("timestamp", -1)])
+                {"device_id": str_device_id}, {"_id": 0, "timestamp": 1},
+                sort=[("timestamp", -1)])
             last_log_ts = None
             if latest_log:
                 ts = latest_log.get("timestamp")
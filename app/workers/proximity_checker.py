@@ -7,7 +7,8 @@ import logging
 from datetime import datetime
 from bson import ObjectId
 from app.database import user_collection, vehicle_collection
-from app.utils.notifications import check_and_notify
+from app.utils.notifications import check_and_notify, LatLng
+from app.utils.geo import haversine_matrix
 from pytz import timezone
 
 logging.basicConfig(level=logging.INFO)
@@ -88,33 +89,35 @@ class ProximityChecker:
                 
                 logger.info(f"🚌 Fleet {fleet_id}: {len(fleet_user_list)} users, {len(vehicles)} vehicles")
                 
+                fleet_user_list = [u for u in fleet_user_list if u.get("location")]
+                vehicles = [v for v in vehicles if v.get("location")]
+                if not fleet_user_list or not vehicles:
+                    continue
+
+                # Every user-vehicle distance for the fleet in one vectorized pass
+                distances = haversine_matrix(
+                    [u["location"]["latitude"] for u in fleet_user_list],
+                    [u["location"]["longitude"] for u in fleet_user_list],
+                    [v["location"]["latitude"] for v in vehicles],
+                    [v["location"]["longitude"] for v in vehicles]
+                )
+
                 # Check each user against each vehicle
-                for user in fleet_user_list:
+                for i, user in enumerate(fleet_user_list):
                     user_id = str(user["_id"])
-                    user_loc = user.get("location")
+                    user_loc = user["location"]
                     
-                    if not user_loc:
-                        continue
-                    
-                    for vehicle in vehicles:
+                    for j, vehicle in enumerate(vehicles):
                         vehicle_id = str(vehicle["_id"])
-                        vehicle_loc = vehicle.get("location")
-                        
-                        if not vehicle_loc:
-                            continue
+                        vehicle_loc = vehicle["location"]
                         
                         total_checks += 1
                         
                         # Create location objects for check_and_notify
-                        user_location = type("UserLoc", (), {
-                            "latitude": user_loc.get("latitude"),
-                            "longitude": user_loc.get("longitude")
-                        })()
-                        
-                        vehicle_location = type("VehicleLoc", (), {
-                            "latitude": vehicle_loc.get("latitude"),
-                            "longitude": vehicle_loc.get("longitude")
-                        })()
+                        user_location = LatLng(
+                            user_loc.get("latitude"), user_loc.get("longitude"))
+                        vehicle_location = LatLng(
+                            vehicle_loc.get("latitude"), vehicle_loc.get("longitude"))
                         
                         # Check proximity and notify if needed
                         notified = await check_and_notify(
@@ -122,7 +125,8 @@ class ProximityChecker:
                             user_location,
                             vehicle_location,
                             vehicle_id,
-                            fleet_id
+                            fleet_id,
+                            distance=float(distances[i, j])
                         )
                         
                         if notified:
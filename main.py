@@ -1,9 +1,11 @@
 from app.workers.background_status_checker import start_background_status_checker
 from fastapi import FastAPI
 from fastapi import Response
+from fastapi.responses import ORJSONResponse
 from app.routes import user
 from app.routes import vehicle
-from app.routes.websockets import ws_router
+from app.routes.websockets import ws_router, fan_out_vehicle_update, vehicle_counts_broadcaster, vehicle_list_broadcaster
+from app.utils.ws_pubsub import pubsub_enabled, run_vehicle_update_listener
 from app.routes.notifications_router import router as notifications_router
 from app.routes.iot_devices import router as iot_router
 from app.routes.fleets import router as fleets_router
@@ -16,25 +18,52 @@ from app.routes import models
 import app.routes.declared_routes as declared_routes
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.background_loader import background_loader
+from app.utils.email_sender import close_email_client, drain_email_queue, otp_sweeper, run_email_workers
 from app.middleware.token_validation import token_validation_middleware  # ADD THIS
 from contextlib import asynccontextmanager
 from app.workers.proximity_checker import start_proximity_checker, stop_proximity_checker
 from app.routes.vehicle import background_eta_updater
+from app.utils.tracking_logs import gps_log_flusher
+from app.database import ensure_indexes
+from logging.handlers import QueueHandler, QueueListener
 import logging
 import asyncio
+import queue
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Handlers write to stdout from a background thread; request handlers and
+# websocket loops only enqueue the record and never block on the stream
+_log_queue = queue.SimpleQueue()
+_root_logger = logging.getLogger()
+log_listener = QueueListener(
+    _log_queue, *_root_logger.handlers, respect_handler_level=True)
+_root_logger.handlers = [QueueHandler(_log_queue)]
+log_listener.start()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global proximity_task
     global eta_task
+    global pubsub_task
+    global counts_task
+    global gps_log_task
+    global vehicle_list_task
+    global otp_sweep_task
+    global email_queue_task
 
     # Startup
     print("🚀 FastAPI starting up...")
 
+    # Make sure the hot-path query indexes exist
+    try:
+        await ensure_indexes()
+        print("✅ MongoDB indexes ensured")
+    except Exception as e:
+        print(f"⚠️ MongoDB index setup warning: {e}")
+
     # Start background model loader
     try:
         background_loader.start_background_loading()
@@ -65,11 +94,62 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ ETA background updater startup warning: {e}")
 
+    # Start batched tracking log writer
+    try:
+        gps_log_task = asyncio.create_task(gps_log_flusher())
+        print("✅ Tracking log flusher started")
+    except Exception as e:
+        print(f"⚠️ Tracking log flusher startup warning: {e}")
+
+    # Start shared vehicle counts broadcaster
+    try:
+        counts_task = asyncio.create_task(vehicle_counts_broadcaster())
+        print("✅ Vehicle counts broadcaster started")
+    except Exception as e:
+        print(f"⚠️ Vehicle counts broadcaster startup warning: {e}")
+
+    # Start shared vehicle list broadcaster
+    try:
+        vehicle_list_task = asyncio.create_task(vehicle_list_broadcaster())
+        print("✅ Vehicle list broadcaster started")
+    except Exception as e:
+        print(f"⚠️ Vehicle list broadcaster startup warning: {e}")
+
+    # Start expired OTP sweeper
+    try:
+        otp_sweep_task = asyncio.create_task(otp_sweeper())
+        print("✅ OTP sweeper started")
+    except Exception as e:
+        print(f"⚠️ OTP sweeper startup warning: {e}")
+
+    # Start queued email senders
+    try:
+        email_queue_task = asyncio.create_task(run_email_workers())
+        print("✅ Email queue workers started")
+    except Exception as e:
+        print(f"⚠️ Email queue startup warning: {e}")
+
+    # Start Redis fan-out listener (multi-worker deployments only)
+    pubsub_task = None
+    if pubsub_enabled():
+        try:
+            pubsub_task = asyncio.create_task(
+                run_vehicle_update_listener(fan_out_vehicle_update))
+            print("✅ Redis vehicle update listener started")
+        except Exception as e:
+            print(f"⚠️ Redis listener startup warning: {e}")
+
     yield
 
     # Shutdown
     print("🔄 FastAPI shutting down...")
 
+    # Stop any pending model load and let an in-flight one finish writing
+    try:
+        await asyncio.to_thread(background_loader.shutdown)
+    except Exception as e:
+        print(f"⚠️ Background loader shutdown warning: {e}")
+
     # Stop proximity checker
     try:
         stop_proximity_checker()
@@ -93,8 +173,86 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ ETA background updater shutdown warning: {e}")
 
+    # Stop vehicle counts broadcaster
+    try:
+        if counts_task:
+            counts_task.cancel()
+            try:
+                await counts_task
+            except asyncio.CancelledError:
+                print("✅ Vehicle counts broadcaster stopped")
+    except Exception as e:
+        print(f"⚠️ Vehicle counts broadcaster shutdown warning: {e}")
+
+    # Stop vehicle list broadcaster
+    try:
+        if vehicle_list_task:
+            vehicle_list_task.cancel()
+            try:
+                await vehicle_list_task
+            except asyncio.CancelledError:
+                print("✅ Vehicle list broadcaster stopped")
+    except Exception as e:
+        print(f"⚠️ Vehicle list broadcaster shutdown warning: {e}")
+
+    # Stop tracking log flusher (flushes anything still buffered)
+    try:
+        if gps_log_task:
+            gps_log_task.cancel()
+            try:
+                await gps_log_task
+            except asyncio.CancelledError:
+                print("✅ Tracking log flusher stopped")
+    except Exception as e:
+        print(f"⚠️ Tracking log flusher shutdown warning: {e}")
 
-app = FastAPI(lifespan=lifespan)
+    # Stop OTP sweeper
+    try:
+        if otp_sweep_task:
+            otp_sweep_task.cancel()
+            try:
+                await otp_sweep_task
+            except asyncio.CancelledError:
+                print("✅ OTP sweeper stopped")
+    except Exception as e:
+        print(f"⚠️ OTP sweeper shutdown warning: {e}")
+
+    # Stop Redis listener
+    try:
+        if pubsub_task:
+            pubsub_task.cancel()
+            try:
+                await pubsub_task
+            except asyncio.CancelledError:
+                print("✅ Redis vehicle update listener stopped")
+    except Exception as e:
+        print(f"⚠️ Redis listener shutdown warning: {e}")
+
+    # Stop queued email senders once what's already queued has gone out
+    try:
+        if email_queue_task:
+            await drain_email_queue()
+            email_queue_task.cancel()
+            try:
+                await email_queue_task
+            except asyncio.CancelledError:
+                print("✅ Email queue workers stopped")
+    except Exception as e:
+        print(f"⚠️ Email queue shutdown warning: {e}")
+
+    # Close the shared Brevo HTTP client
+    try:
+        await close_email_client()
+    except Exception as e:
+        print(f"⚠️ Email client shutdown warning: {e}")
+
+    # Flush any log records still queued for the writer thread
+    log_listener.stop()
+
+
+# orjson encodes response bodies (lists of vehicles, logs, ...) far faster
+# than the stdlib json encoder FastAPI uses by default
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Add CORS middleware first
 app.add_middleware(
@@ -168,20 +326,15 @@ def server_status():
 def reload_models():
     """Manually trigger model reloading (useful after setting environment variables)"""
     try:
-        if background_loader.is_loading:
+        if not background_loader.begin_reload():
             return {"message": "Models are already loading", "status": "loading"}
 
-        background_loader.load_complete = False
-        background_loader.load_error = None
-        background_loader.is_loading = True
-
         import threading
 
         def load_models_now():
+            error = None
             try:
                 print("🔄 Manual model loading triggered...")
-                print(
-                    f"📊 Initial state: loading={background_loader.is_loading}, complete={background_loader.load_complete}, error={background_loader.load_error}")
 
                 print("🧠 Attempting memory-optimized model loading...")
                 import gc
@@ -189,37 +342,26 @@ def reload_models():
 
                 try:
                     print("📦 Loading models with memory optimization...")
-                    background_loader.ml_manager._load_all()
+                    background_loader.load_all_models()
                     gc.collect()
 
-                    background_loader.load_complete = True
-                    background_loader.is_loading = False
-                    background_loader.load_error = None
-
                     print("✅ Memory-optimized model loading completed!")
-                    print(
-                        f"📊 Final state: loading={background_loader.is_loading}, complete={background_loader.load_complete}")
 
                 except MemoryError as me:
                     error_msg = f"Railway memory limit exceeded: {str(me)}"
                     print(f"💾 {error_msg}")
-                    background_loader.load_error = f"Memory limit exceeded. Try upgrading Railway plan."
-                    background_loader.is_loading = False
-                    background_loader.load_complete = False
+                    error = "Memory limit exceeded. Try upgrading Railway plan."
 
                 except Exception as model_error:
-                    error_msg = f"Model loading error: {str(model_error)}"
-                    print(f"❌ {error_msg}")
-                    background_loader.load_error = error_msg
-                    background_loader.is_loading = False
-                    background_loader.load_complete = False
+                    error = f"Model loading error: {str(model_error)}"
+                    print(f"❌ {error}")
 
             except Exception as e:
-                error_msg = f"Manual model loading failed: {str(e)}"
-                print(f"❌ {error_msg}")
-                background_loader.load_error = error_msg
-                background_loader.is_loading = False
-                background_loader.load_complete = False
+                error = f"Manual model loading failed: {str(e)}"
+                print(f"❌ {error}")
+            finally:
+                # Publish the outcome and wake anyone blocked in wait_for_models
+                background_loader.finish_reload(error)
 
         thread = threading.Thread(target=load_models_now)
         thread.daemon = True